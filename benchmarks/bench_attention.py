@@ -0,0 +1,112 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the attention backends on the DiT attention shapes.
+
+    python benchmarks/bench_attention.py --device cuda
+    python benchmarks/bench_attention.py --device cpu --seq_len 4680 --frames 3 --backends math sdpa
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from humo.models.wan_modules.attention import ATTENTION_BACKENDS, check_attention_backend
+
+
+def make_cases(args, device, dtype):
+    n, d = args.heads, args.head_dim
+    hw = args.seq_len // args.frames
+
+    def randn(*shape):
+        return torch.randn(*shape, device=device, dtype=dtype)
+
+    cases = {
+        # self-attention over all video tokens, e.g. 1x32760x40x128
+        "self": dict(q=randn(1, args.seq_len, n, d), k=randn(1, args.seq_len, n, d), v=randn(1, args.seq_len, n, d)),
+        # self-attention with padded keys, exercises the varlen path
+        "self_padded": dict(
+            q=randn(1, args.seq_len, n, d), k=randn(1, args.seq_len, n, d), v=randn(1, args.seq_len, n, d),
+            k_lens=torch.tensor([args.seq_len - hw], dtype=torch.int32, device=device)),
+        # text cross-attention against the 512-token context
+        "cross": dict(q=randn(1, args.seq_len, n, d), k=randn(1, 512, n, d), v=randn(1, 512, n, d)),
+        # audio gather cross-attention: one frame of video tokens against its 16 audio tokens
+        "audio": dict(q=randn(args.frames, hw, n, d), k=randn(args.frames, 16, n, d), v=randn(args.frames, 16, n, d)),
+    }
+    return {name: cases[name] for name in args.cases}
+
+
+def synchronize(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--dtype", default="bfloat16", choices=["bfloat16", "float16", "float32"])
+    parser.add_argument("--backends", nargs="+", default=["fa3", "fa2", "sdpa", "math"])
+    parser.add_argument("--cases", nargs="+", default=["self", "self_padded", "cross", "audio"])
+    parser.add_argument("--seq_len", type=int, default=32760)
+    parser.add_argument("--frames", type=int, default=21)
+    parser.add_argument("--heads", type=int, default=40)
+    parser.add_argument("--head_dim", type=int, default=128)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--iters", type=int, default=10)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    dtype = getattr(torch, args.dtype)
+    backends = []
+    for name in args.backends:
+        try:
+            check_attention_backend(name)
+            backends.append(name)
+        except ValueError as e:
+            print(f"skip {name}: {e}")
+
+    torch.manual_seed(0)
+    for case, inputs in make_cases(args, device, dtype).items():
+        print(f"{case}: q {tuple(inputs['q'].shape)} k {tuple(inputs['k'].shape)}")
+        reference = None
+        for name in backends:
+            fn = ATTENTION_BACKENDS[name]
+            try:
+                for _ in range(args.warmup):
+                    out = fn(**inputs)
+                synchronize(device)
+                if device.type == "cuda":
+                    torch.cuda.reset_peak_memory_stats(device)
+                start = time.perf_counter()
+                for _ in range(args.iters):
+                    out = fn(**inputs)
+                synchronize(device)
+            except (RuntimeError, NotImplementedError) as e:
+                print(f"  {name:6s} failed: {str(e).splitlines()[0]}")
+                continue
+            ms = (time.perf_counter() - start) / args.iters * 1000
+            peak = torch.cuda.max_memory_allocated(device) / 2**20 if device.type == "cuda" else float("nan")
+            if reference is None:
+                reference, diff = out.float(), 0.0
+            else:
+                diff = (out.float() - reference).abs().max().item()
+            print(f"  {name:6s} {ms:10.2f} ms  peak {peak:10.1f} MB  max diff {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Steps-to-quality of the registered samplers on fixed seeds.
+
+The model is the exact flow of a Gaussian mixture, so every sampler can be scored against a
+converged reference solve without loading the DiT. Reports the RMSE to the reference per step
+count, the fewest steps reaching --tolerance, and the scheduler overhead per step.
+
+    python benchmarks/bench_samplers.py
+    python benchmarks/bench_samplers.py --samplers unipc dpm++3m --steps 8 12 20 --shift 5.0
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from humo.models.utils.samplers import SAMPLERS, build_sampler
+
+
+class MixtureFlow:
+    """
+    Exact flow velocity eps - E[x0 | x_t] for x_t = (1 - sigma) x0 + sigma eps, with x0 drawn
+    from a mixture of isotropic Gaussians.
+    """
+
+    def __init__(self, dim, components, scale, seed, device):
+        g = torch.Generator().manual_seed(seed)
+        self.means = torch.randn(components, dim, generator=g).to(device)
+        self.scale = scale
+
+    def __call__(self, x, sigma):
+        a = 1 - sigma
+        var = a**2 * self.scale**2 + sigma**2
+        diff = x[:, None] - a * self.means[None]
+        weights = (-(diff**2).sum(-1) / (2 * var)).softmax(-1)
+        x0 = self.means[None] + (a * self.scale**2 / var) * diff
+        x0 = (weights[..., None] * x0).sum(1)
+        return (x - x0) / sigma
+
+
+def solve(name, order, steps, shift, flow, noise):
+    scheduler = build_sampler(name, order=order)
+    scheduler.set_timesteps(steps, device=noise.device, shift=shift)
+    x = noise
+    overhead = 0.0
+    for i, t in enumerate(scheduler.timesteps):
+        v = flow(x, float(scheduler.sigmas[i]))
+        start = time.perf_counter()
+        x = scheduler.step(v, t, x, return_dict=False)[0]
+        overhead += time.perf_counter() - start
+    return x, overhead / steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samplers", nargs="+", default=list(SAMPLERS))
+    parser.add_argument("--order", type=int, default=None, help="unipc solver order")
+    parser.add_argument("--steps", type=int, nargs="+", default=[4, 6, 8, 12, 16, 20, 30, 50])
+    parser.add_argument("--reference_steps", type=int, default=2000)
+    parser.add_argument("--shift", type=float, default=5.0)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--components", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=0.1)
+    parser.add_argument("--tolerance", type=float, default=1e-2)
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    flow = MixtureFlow(args.dim, args.components, args.scale, 0, device)
+    noises = [torch.randn(args.samples, args.dim, generator=torch.Generator().manual_seed(seed)).to(device)
+              for seed in args.seeds]
+    # A converged high-order solve is the reference every sampler converges to.
+    references = [solve("unipc", 3, args.reference_steps, args.shift, flow, noise)[0] for noise in noises]
+
+    print(f"RMSE to a {args.reference_steps}-step reference, mean over seeds {args.seeds}, shift {args.shift}")
+    print(f"{'sampler':10s}" + "".join(f"{steps:>10d}" for steps in args.steps) + f"{'to tol':>10s}{'us/step':>10s}")
+    for name in args.samplers:
+        errors, overheads = [], []
+        for steps in args.steps:
+            rmse = 0.0
+            for noise, reference in zip(noises, references):
+                x, overhead = solve(name, args.order, steps, args.shift, flow, noise)
+                rmse += (x - reference).pow(2).mean().sqrt().item() / len(noises)
+                overheads.append(overhead)
+            errors.append(rmse)
+        reached = [steps for steps, rmse in zip(args.steps, errors) if rmse <= args.tolerance]
+        to_tol = str(reached[0]) if reached else "-"
+        us = sum(overheads) / len(overheads) * 1e6
+        print(f"{name:10s}" + "".join(f"{rmse:10.2e}" for rmse in errors) + f"{to_tol:>10s}{us:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Wan VAE decode throughput with the clone/cat causal caches (legacy), the staging buffers
+(staging), the fast path in --fast_dtype (fast, see WanVAE.set_fast_path) and the fast path
+with regional torch.compile (compile), decoding --chunk latent frames per decoder call.
+
+Runs with random weights unless --checkpoint is given, so the max diff column compares
+the modes against the first one, not against real footage.
+
+    python benchmarks/bench_vae.py --device cuda --latent_frames 21 --height 480 --width 832
+    python benchmarks/bench_vae.py --device cpu --latent_frames 5 --height 240 --width 416
+    python benchmarks/bench_vae.py --device cpu --latent_frames 5 --height 240 --width 416 --fast_dtype float32
+    python benchmarks/bench_vae.py --device cuda --modes staging fast compile --chunk 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from humo.models.wan_modules.vae import CausalConv3d, WanVAE
+
+
+def synchronize(device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def run(vae, z, device, iters):
+    synchronize(device)
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+    start = time.perf_counter()
+    for _ in range(iters):
+        video = vae.decode([z])[0]
+    synchronize(device)
+    seconds = (time.perf_counter() - start) / iters
+    peak = torch.cuda.max_memory_allocated(device) / 2**20 if device.type == "cuda" else float("nan")
+    return video, seconds, peak
+
+
+def make_vae(args, device, mode):
+    # same random weights for every mode
+    torch.manual_seed(0)
+    vae = WanVAE(vae_pth=args.checkpoint, dtype=getattr(torch, args.dtype), device=device)
+    if args.chunk > 1:
+        vae.set_decode_chunk(frames=args.chunk)
+    CausalConv3d.staging = mode != "legacy"
+    if mode in ("fast", "compile"):
+        vae.set_fast_path(dtype=getattr(torch, args.fast_dtype))
+    if mode == "compile":
+        vae.compile()
+    return vae
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--dtype", default="float32", choices=["bfloat16", "float16", "float32"])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--latent_frames", type=int, default=21)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "staging", "fast"],
+                        choices=["legacy", "staging", "fast", "compile"])
+    parser.add_argument("--fast_dtype", default="bfloat16", choices=["bfloat16", "float16", "float32"])
+    parser.add_argument("--chunk", type=int, default=1, help="latent frames per decoder call")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--iters", type=int, default=3)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    torch.manual_seed(0)
+    z = torch.randn(16, args.latent_frames, args.height // 8, args.width // 8, device=device)
+    frames = 4 * (args.latent_frames - 1) + 1
+
+    print(f"decode {tuple(z.shape)} -> {frames} frames at {args.width}x{args.height}, {args.dtype} on {device}, "
+          f"{args.chunk} latent frames per call")
+    reference = None
+    for mode in args.modes:
+        vae = make_vae(args, device, mode)
+        # warm-up also triggers the compilation
+        for _ in range(args.warmup):
+            vae.decode([z])
+        video, seconds, peak = run(vae, z, device, args.iters)
+        if reference is None:
+            reference, diff = video, 0.0
+        else:
+            diff = (video - reference).abs().max().item()
+        print(f"  {mode:8s} {seconds:8.2f}s {frames / seconds:8.1f} fps  peak {peak:10.1f} MB  max diff {diff:.2e}")
+        del vae, video
+    CausalConv3d.staging = True
+
+
+if __name__ == "__main__":
+    main()
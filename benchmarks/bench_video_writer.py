@@ -0,0 +1,104 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the ffmpeg-pipe video writer against the previous moviepy path.
+
+    python benchmarks/bench_video_writer.py --frames 2000 --height 480 --width 832
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from humo.models.utils.utils import tensor_to_video
+
+
+def moviepy_tensor_to_video(tensor, output_video_path, input_audio_path, fps=25):
+    # The writer used before the ffmpeg pipe, kept here as the baseline.
+    from moviepy.editor import AudioFileClip, VideoClip
+
+    def make_frame(t):
+        frame_index = min(int(t * fps), tensor.shape[0] - 1)
+        return tensor[frame_index]
+
+    video_duration = tensor.shape[0] / fps
+    audio_clip = AudioFileClip(input_audio_path)
+    final_duration = min(video_duration, audio_clip.duration)
+    audio_clip = audio_clip.subclip(0, final_duration)
+    video_clip = VideoClip(make_frame, duration=final_duration).set_audio(audio_clip)
+    video_clip.write_videofile(output_video_path, fps=fps, audio_codec="aac", logger=None)
+
+
+def synthetic_frames(frames, height, width):
+    # Moving gradients compress like real footage, unlike uniform noise.
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    video = np.empty((frames, height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        video[i, :, :, 0] = (x + 3 * i) % 256
+        video[i, :, :, 1] = (y + 2 * i) % 256
+        video[i, :, :, 2] = (x + y + i) % 256
+    return video
+
+
+def write_sine_wav(path, seconds, sample_rate=16000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (0.2 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--presets", nargs="+", default=["medium", "veryfast", "ultrafast"])
+    parser.add_argument("--skip_moviepy", action="store_true")
+    args = parser.parse_args()
+
+    video = synthetic_frames(args.frames, args.height, args.width)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_path = os.path.join(tmp_dir, "audio.wav")
+        write_sine_wav(audio_path, args.frames / args.fps)
+
+        results = []
+        if not args.skip_moviepy:
+            start = time.perf_counter()
+            moviepy_tensor_to_video(video, os.path.join(tmp_dir, "moviepy.mp4"), audio_path, fps=args.fps)
+            results.append(("moviepy (medium)", time.perf_counter() - start, os.path.join(tmp_dir, "moviepy.mp4")))
+
+        for preset in args.presets:
+            path = os.path.join(tmp_dir, f"ffmpeg_{preset}.mp4")
+            start = time.perf_counter()
+            tensor_to_video(video, path, audio_path, fps=args.fps, preset=preset)
+            results.append((f"ffmpeg pipe ({preset})", time.perf_counter() - start, path))
+
+        print(f"{args.frames} frames at {args.width}x{args.height}, {args.fps} fps")
+        for name, seconds, path in results:
+            print(f"{name:24s} {seconds:8.2f}s {args.frames / seconds:8.1f} fps {os.path.getsize(path) / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Numerical equivalence of the temporal-parallel VAE decode against the sequential decode.
+
+Every segment re-warms its causal cache on --halos latent frames, so the error shrinks as the
+halo grows. A halo covering the whole latent warms every segment up from the first frame and
+must match the sequential decode to --tolerance. The halo used by the inference configs
+(--halo, 4) must stay within --halo_tolerance. Otherwise the script exits non-zero.
+
+    python benchmarks/check_parallel_decode.py --latent_frames 9 --height 240 --width 416
+    python benchmarks/check_parallel_decode.py --checkpoint Wan2.1_VAE.pth --workers 2 4 --halos 1 2 4 8
+    torchrun --nproc_per_node 2 benchmarks/check_parallel_decode.py --backend distributed
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torch.distributed as dist
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from humo.models.wan_modules.vae import WanVAE
+
+
+def decode(vae, z):
+    start = time.perf_counter()
+    video = vae.decode([z])[0]
+    return video, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="process", choices=["process", "distributed"])
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--latent_frames", type=int, default=9)
+    parser.add_argument("--height", type=int, default=240)
+    parser.add_argument("--width", type=int, default=416)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2], help="process backend worker counts")
+    parser.add_argument("--halos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--halo", type=int, default=4, help="configured halo, see parallel_decode.halo")
+    parser.add_argument("--halo_tolerance", type=float, default=2e-2,
+                        help="max abs diff allowed at the configured halo, video range is [-1, 1]")
+    args = parser.parse_args()
+
+    if args.backend == "distributed":
+        dist.init_process_group("gloo")
+        args.workers = [dist.get_world_size()]
+    main_rank = not dist.is_initialized() or dist.get_rank() == 0
+    # A halo of T - 1 warms every segment up from the first latent frame, i.e. the exact decode.
+    exact = args.latent_frames - 1
+    halos = sorted(set(args.halos) | {exact, min(args.halo, exact)})
+
+    vae = WanVAE(vae_pth=args.checkpoint, dtype=torch.float32, device="cpu")
+    torch.manual_seed(0)
+    z = torch.randn(16, args.latent_frames, args.height // 8, args.width // 8)
+    reference, seconds = decode(vae, z)
+    if main_rank:
+        print(f"decode {tuple(z.shape)} -> {tuple(reference.shape)}, {args.backend} backend")
+        print(f"  {'sequential':22s} {seconds:8.2f}s")
+
+    failures = []
+    for workers in args.workers:
+        for halo in halos:
+            vae.set_parallel_decode(backend=args.backend, workers=workers, halo=halo)
+            # The first process decode spawns the pool, keep that out of the timing.
+            if args.backend == "process" and vae.segment_pool is None:
+                decode(vae, z)
+            video, seconds = decode(vae, z)
+            diff = (video - reference).abs()
+            if halo == exact and diff.max().item() > args.tolerance:
+                failures.append(f"{workers} workers, full halo: max diff above {args.tolerance}")
+            elif halo == args.halo and diff.max().item() > args.halo_tolerance:
+                failures.append(f"{workers} workers, halo {halo}: max diff above {args.halo_tolerance}")
+            if main_rank:
+                label = f"{workers} workers, halo {halo}" + (" (exact)" if halo == exact else "")
+                print(f"  {label:22s} {seconds:8.2f}s  max diff {diff.max().item():.2e}  "
+                      f"mean diff {diff.mean().item():.2e}")
+    if vae.segment_pool is not None:
+        vae.segment_pool.shutdown()
+    if dist.is_initialized():
+        dist.destroy_process_group()
+    if failures:
+        if main_rank:
+            print("parallel decode differs from the sequential decode:")
+            for failure in failures:
+                print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
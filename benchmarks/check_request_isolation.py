@@ -0,0 +1,110 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Request isolation of the resident runner used by glut.py.
+
+Runs a request on a freshly built Generator, then a request that fails in the middle of
+sampling, then the first request again, the way glut.py serves them. The last latent must
+match the fresh one to --tolerance, otherwise the script exits non-zero. Needs the weights
+referenced by --config.
+
+    python benchmarks/check_request_isolation.py --audio assets/audio.wav --image assets/ref.png
+    python benchmarks/check_request_isolation.py --audio assets/audio.wav --frames 49 --fail_after 3
+"""
+
+import argparse
+import os
+import sys
+
+import torch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "humo")]
+
+from common.config import create_object, load_config
+
+
+class InjectedFailure(RuntimeError):
+    pass
+
+
+def request(generator, args):
+    # Same call sequence as glut.generate.
+    generator.reset_sampling_state()
+    config = generator.config
+    return generator.inference(
+        args.prompt,
+        [args.image] if args.image else None,
+        args.audio,
+        size=(args.width, args.height),
+        frame_num=args.frames,
+        shift=config.diffusion.timesteps.sampling.shift,
+        sampling_steps=config.diffusion.timesteps.sampling.steps,
+        seed=args.seed,
+        offload_model=False,
+        mode="TIA" if args.image else "TA",
+        decode=False,
+    ).float().cpu()
+
+
+def failing_request(generator, args):
+    # Raise from the guidance step after fail_after DiT calls, inside the sampling loop.
+    forward_mode = generator.forward_mode
+    calls = [0]
+
+    def fail(*fargs, **fkwargs):
+        calls[0] += 1
+        if calls[0] > args.fail_after:
+            raise InjectedFailure(f"injected failure after {args.fail_after} guidance calls")
+        return forward_mode(*fargs, **fkwargs)
+
+    generator.forward_mode = fail
+    try:
+        request(generator, args)
+    except InjectedFailure as e:
+        print(f"failed request: {e}")
+    else:
+        raise AssertionError("the failing request did not fail, lower --fail_after")
+    finally:
+        del generator.forward_mode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default=os.path.join(ROOT, "glut.yaml"))
+    parser.add_argument("--prompt", default="A person is talking.")
+    parser.add_argument("--image", default=None)
+    parser.add_argument("--audio", required=True)
+    parser.add_argument("--width", type=int, default=832)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--frames", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail_after", type=int, default=2)
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    args, overrides = parser.parse_known_args()
+
+    generator = create_object(load_config(args.config, overrides))
+    generator.configure_models()
+
+    fresh = request(generator, args)
+    failing_request(generator, args)
+    after = request(generator, args)
+
+    diff = (after - fresh).abs().max().item()
+    print(f"latent {tuple(fresh.shape)}, max diff after a failed request {diff:.2e}")
+    if diff > args.tolerance:
+        print(f"request after a failure differs from a fresh run by more than {args.tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
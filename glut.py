@@ -12,9 +12,9 @@ import torch
 import gradio as gr
 import random
 import numpy as np
-import json
 import os
-import yaml
+import gc
+import threading
 
 parser = argparse.ArgumentParser() 
 parser.add_argument("--server_name", type=str, default="127.0.0.1", help="IP地址，局域网访问改为0.0.0.0")
@@ -43,6 +43,22 @@ else:
     device = "cpu"
 
 
+runner = None
+runner_lock = threading.Lock()
+
+
+def get_runner():
+    """
+    Build the Generator once and keep all models resident between requests.
+    """
+    global runner
+    if runner is None:
+        config = load_config("glut.yaml")
+        runner = create_object(config)
+        runner.configure_models()
+    return runner
+
+
 def generate(
     audio,
     prompt,
@@ -65,50 +81,39 @@ def generate(
             width = 832
             height = 480
 
-        data = {
-            "glut": {
-                "img_paths": [image] if image else "",  # 处理空图片情况
-                "audio_path": audio,
-                "prompt": prompt
-            }
-        }
-
-        # 写入JSON文件（保留原有格式）
-        json_path = "glut.json"
-        if os.path.exists(json_path):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            existing_data.update(data)
-            data = existing_data
-        
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-
         mode="TIA" if image else "TA"
 
-        # 读取当前配置文件路径
-        config_path = "glut.yaml"
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
-
-        # 更新字段
-        config['generation']['mode'] = mode
-        config['generation']['width'] = width
-        config['generation']['height'] = height
-        config['generation']['frames'] = num_frames
-        config['generation']['sample_neg_prompt'] = negative_prompt
-        config['generation']['seed'] = seed
-
-        # 写回文件
-        with open(config_path, 'w', encoding='utf-8') as f:
-            yaml.safe_dump(config, f, allow_unicode=True, default_flow_style=False)
-
-        # Load config
-        config = load_config(config_path)
-        runner = create_object(config)
-        runner.entrypoint()
-
-        return f"outputs/glut_seed{seed}.mp4", f"种子数{seed}，保存在outputs/glut_seed{seed}.mp4"
+        with runner_lock:
+            generator = get_runner()
+            config = generator.config
+            # A failed request must not leave cached conditioning or step residuals behind.
+            generator.reset_sampling_state()
+            latent = generator.inference(
+                prompt.strip().replace("_", " ").strip('"'),
+                [image] if image else None,
+                audio,
+                size=(width, height),
+                frame_num=num_frames,
+                shift=config.diffusion.timesteps.sampling.shift,
+                sampling_steps=config.diffusion.timesteps.sampling.steps,
+                n_prompt=negative_prompt,
+                seed=seed,
+                offload_model=False,
+                mode=mode,
+                decode=False,
+            )
+            os.makedirs(config.generation.output.dir, exist_ok=True)
+            pathname = generator.save_latent_video(
+                latent=latent,
+                audio_path=audio,
+                itemname="glut",
+                seed=seed,
+            )
+            del latent
+            torch.cuda.empty_cache()
+            gc.collect()
+
+        return pathname, f"种子数{seed}，保存在{pathname}"
     
     except Exception as e:
         error_msg = f"发生错误：{str(e)}"
@@ -0,0 +1,176 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Content-addressed tensor cache utility functions.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import torch
+from omegaconf import DictConfig
+from safetensors.torch import load_file, save_file
+
+_SUFFIX = ".safetensors"
+
+
+def hash_key(*parts) -> str:
+    """
+    Hash strings, bytes and numbers into a hex cache key.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash the content of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_identity(path: str) -> str:
+    """
+    Cheap identity of a checkpoint file or directory: real path, size and mtime.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def tensors_nbytes(tensors: Dict[str, torch.Tensor]) -> int:
+    return sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+class TensorCache:
+    """
+    Two-tier LRU cache of named CPU tensors.
+    The memory tier holds at most max_memory_mb. The disk tier, enabled when
+    cache_dir is set, keeps one safetensors file per key and at most max_disk_mb.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_memory_mb: float = 512,
+        max_disk_mb: float = 4096,
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = int(max_memory_mb * 2**20)
+        self.max_disk_bytes = int(max_disk_mb * 2**20)
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            tensors = load_file(path)
+        except Exception:
+            # Partially written or corrupted entry.
+            os.remove(path)
+            return None
+        os.utime(path)
+        self._put_memory(key, tensors)
+        return tensors
+
+    def put(self, key: str, tensors: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        tensors = {
+            name: tensor.detach().to("cpu").clone(memory_format=torch.contiguous_format)
+            for name, tensor in tensors.items()
+        }
+        self._put_memory(key, tensors)
+        path = self._path(key)
+        if path is not None:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            save_file(tensors, tmp_path)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        return tensors
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def _put_memory(self, key: str, tensors: Dict[str, torch.Tensor]):
+        nbytes = tensors_nbytes(tensors)
+        if nbytes > self.max_memory_bytes:
+            return
+        with self.lock:
+            if key in self.memory:
+                self.memory_bytes -= tensors_nbytes(self.memory.pop(key))
+            self.memory[key] = tensors
+            self.memory_bytes += nbytes
+            while self.memory_bytes > self.max_memory_bytes:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= tensors_nbytes(evicted)
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def create_tensor_cache(config: Optional[DictConfig]) -> Optional[TensorCache]:
+    """
+    Create a TensorCache from a config node, or None if it is missing or disabled.
+    The node may contain: enabled, dir, max_memory_mb, max_disk_mb.
+    """
+    if config is None or not config.get("enabled", True):
+        return None
+    return TensorCache(
+        cache_dir=config.get("dir", None),
+        max_memory_mb=config.get("max_memory_mb", 512),
+        max_disk_mb=config.get("max_disk_mb", 4096),
+    )
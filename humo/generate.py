@@ -17,7 +17,6 @@ import os
 import gc
 import random
 import sys
-import mediapy
 import torch
 import torch.distributed as dist
 from omegaconf import DictConfig, ListConfig, OmegaConf
@@ -29,15 +28,19 @@ from tqdm import tqdm
 from common.distributed import meta_non_persistent_buffer_init_fn
 from common.logger import get_logger
 from common.config import create_object
+from common.cache import create_tensor_cache, file_identity, hash_file, hash_key
 from common.distributed import get_device, get_global_rank
 from torchvision.transforms import Compose, Normalize, ToTensor
 from humo.models.wan_modules.t5 import T5EncoderModel
 from humo.models.wan_modules.vae import WanVAE
-from humo.models.utils.utils import tensor_to_video, prepare_json_dataset
+from humo.models.utils.offload import BlockSwapper, ResidencyManager
+from humo.models.wan_modules.model_humo import ConditionCache, StepCache
+from humo.models.utils.utils import FFmpegVideoWriter, tensor_to_video, prepare_json_dataset
 from contextlib import contextmanager
 import torch.amp as amp
-from humo.models.utils.fm_solvers_unipc import FlowUniPCMultistepScheduler
+from humo.models.utils.samplers import build_sampler
 from humo.utils.audio_processor_whisper import AudioProcessor
+from humo.utils.zero_vae import ZeroVAE
 from humo.utils.wav2vec import linear_interpolation_fps
 from optimum.quanto import freeze, qint8, quantize
 
@@ -81,6 +84,12 @@ class Generator():
         OmegaConf.set_readonly(self.config, True)
         self.logger = get_logger(self.__class__.__name__)
         torch.backends.cudnn.benchmark = False
+        # Number of guidance passes stacked into one DiT forward (1, 2 or 3).
+        self.cfg_batch = min(max(int(self.config.generation.get("cfg_batch", 1)), 1), 3)
+        self.guidance_plans = {}
+        self.guidance_passes = 0
+        self.guidance_reused = 0
+        self.guidance_delta_states = {}
 
 
     def entrypoint(self):
@@ -94,6 +103,7 @@ class Generator():
         if self.config.generation.get('extract_audio_feat', False):
             self.configure_wav2vec(device="cpu")
         self.configure_text_model(device="cpu")
+        self.configure_residency()
     
 
     def configure_dit_model(self, device=get_device()):
@@ -114,6 +124,50 @@ class Generator():
         
         requantize(self.dit, state_dict, quantization_map, device=torch.device('cpu'))
         self.dit = meta_non_persistent_buffer_init_fn(self.dit)
+
+        attention = self.config.dit.get("attention", None)
+        if attention is not None:
+            self.dit.set_attention_backends(
+                self_attn=attention.get("self_attn", "auto"),
+                cross_attn=attention.get("cross_attn", "auto"),
+                audio_attn=attention.get("audio_attn", "auto"),
+            )
+
+        ffn_chunk = self.config.dit.get("ffn_chunk", None)
+        if ffn_chunk is not None and ffn_chunk.get("enabled", False):
+            self.dit.set_ffn_chunking(
+                chunk_size=ffn_chunk.get("size", None),
+                memory_mb=ffn_chunk.get("memory_mb", 1024),
+            )
+
+        # Text and audio tokens and their cross-attention K/V are computed once per request.
+        condition_cache = self.config.dit.get("condition_cache", None)
+        if condition_cache is not None and condition_cache.get("enabled", False):
+            self.dit.condition_cache = ConditionCache(
+                max_memory_mb=condition_cache.get("max_memory_mb", 2048),
+                shared_memory_mb=condition_cache.get("shared_memory_mb", 2048),
+            )
+
+        step_cache = self.config.dit.get("step_cache", None)
+        if step_cache is not None and step_cache.get("enabled", False):
+            self.dit.step_cache = StepCache(
+                threshold=step_cache.get("threshold", 0.05),
+                metric=step_cache.get("metric", "e0"),
+                warmup_steps=step_cache.get("warmup_steps", 1),
+                final_steps=step_cache.get("final_steps", 1),
+            )
+
+        # Optionally stream the transformer blocks from pinned CPU memory during sampling.
+        self.block_swapper = None
+        block_swap = self.config.dit.get("block_swap", None)
+        if block_swap is not None and block_swap.get("enabled", False):
+            self.block_swapper = BlockSwapper(
+                self.dit,
+                self.dit.blocks,
+                resident_blocks=block_swap.get("resident_blocks", 0),
+                resident_gb=block_swap.get("resident_gb", None),
+                prefetch_blocks=block_swap.get("prefetch_blocks", 1),
+            )
         
         # Print model size.
         params = sum(p.numel() for p in self.dit.parameters())
@@ -127,13 +181,45 @@ class Generator():
         self.vae = WanVAE(
             vae_pth=self.config.vae.checkpoint,
             device=device)
+        fast_path = self.config.vae.get("fast_path", None)
+        if fast_path is not None and fast_path.get("enabled", False):
+            self.vae.set_fast_path(
+                dtype=getattr(torch, self.config.vae.get("dtype", "float32")),
+                channels_last=fast_path.get("channels_last", True),
+                fused=fast_path.get("fused", True),
+            )
+        if self.config.vae.get("compile", False):
+            self.vae.compile()
+        tiling = self.config.vae.get("tiling", None)
+        if tiling is not None and tiling.get("enabled", False):
+            self.vae.set_tiling(
+                tile_size=tiling.get("tile_size", None),
+                overlap=tiling.get("overlap", 4),
+                memory_mb=tiling.get("memory_mb", None),
+            )
+        decode_chunk = self.config.vae.get("decode_chunk", None)
+        if decode_chunk is not None and decode_chunk.get("enabled", False):
+            self.vae.set_decode_chunk(
+                frames=decode_chunk.get("frames", None),
+                memory_mb=decode_chunk.get("memory_mb", None),
+            )
+        parallel_decode = self.config.vae.get("parallel_decode", None)
+        if parallel_decode is not None and parallel_decode.get("enabled", False):
+            self.vae.set_parallel_decode(
+                backend=parallel_decode.get("backend", "process"),
+                workers=parallel_decode.get("workers", None),
+                halo=parallel_decode.get("halo", 4),
+            )
+        self.image_cache = create_tensor_cache(self.config.vae.get("cache", None))
+        if self.image_cache is not None:
+            self.image_cache_id = hash_key(file_identity(self.config.vae.checkpoint), "image_latent")
         
-        if self.config.generation.height == 480:
-            self.zero_vae = torch.load(self.config.dit.zero_vae_path)
-        elif self.config.generation.height == 720:
-            self.zero_vae = torch.load(self.config.dit.zero_vae_720p_path)
-        else:
-            raise ValueError(f"Unsupported height {self.config.generation.height} for zero-vae.")
+        self.zero_vae = ZeroVAE(
+            self.vae,
+            self.config.vae.checkpoint,
+            cache=create_tensor_cache(self.config.dit.get("zero_vae_cache", None)),
+            seed_paths=[self.config.dit.get("zero_vae_path", None), self.config.dit.get("zero_vae_720p_path", None)],
+        )
     
 
     def configure_wav2vec(self, device=get_device()):
@@ -149,6 +235,7 @@ class Generator():
             None,  # not seperate
             os.path.join(self.config.generation.output.dir, "vocals"),
             device=device,
+            feature_cache=create_tensor_cache(self.config.audio.get("cache", None)),
         )
 
 
@@ -160,90 +247,124 @@ class Generator():
             checkpoint_path=self.config.text.t5_checkpoint,
             tokenizer_path=self.config.text.t5_tokenizer,
             )
+        self.text_cache = create_tensor_cache(self.config.text.get("cache", None))
+        if self.text_cache is not None:
+            self.text_cache_id = hash_key(
+                file_identity(self.config.text.t5_tokenizer),
+                file_identity(self.config.text.t5_checkpoint),
+                self.text_encoder.text_len,
+                self.text_encoder.dtype,
+            )
+
+
+    def configure_residency(self):
+        offload = self.config.get("offload", None) or {}
+        self.residency = ResidencyManager(
+            get_device(),
+            budget_gb=offload.get("budget_gb", None),
+            pin_memory=offload.get("pin_memory", True),
+        )
+        self.residency.register("dit", self.dit, handle=self.block_swapper, on_evict=self.dit.release_caches)
+        self.residency.register("vae", self.vae.model)
+        self.residency.register("t5", self.text_encoder.model)
+        if hasattr(self, "audio_processor"):
+            self.residency.register("whisper", self.audio_processor.whisper)
+
+
+    @contextmanager
+    def on_device(self, module, device):
+        if module in self.residency:
+            with self.residency.use(module):
+                yield module
+            return
+        module.to(device)
+        try:
+            yield module
+        finally:
+            module.cpu()
+
+
+    def encode_text(self, texts, device):
+        """
+        Encode prompts with T5. Embeddings are cached by tokenizer, checkpoint and cleaned text,
+        so the encoder is only moved to the device when a prompt misses the cache.
+        """
+        if self.text_cache is None:
+            with self.on_device(self.text_encoder.model, device):
+                return [self.text_encoder([text], device)[0] for text in texts]
+
+        keys = [hash_key(self.text_cache_id, self.text_encoder.tokenizer._clean(text)) for text in texts]
+        contexts = [self.text_cache.get(key) for key in keys]
+        missing = [i for i, context in enumerate(contexts) if context is None]
+        if missing:
+            with self.on_device(self.text_encoder.model, device):
+                for i in missing:
+                    context = self.text_encoder([texts[i]], device)[0]
+                    contexts[i] = self.text_cache.put(keys[i], {"context": context})
+        self.logger.info(f"T5 cache: {len(texts) - len(missing)}/{len(texts)} prompts reused.")
+        return [context["context"].to(device) for context in contexts]
 
 
     def load_image_latent_ref_id(self, path: str, size, device):
+        if isinstance(path, str):
+            path = [path]
+
+        # Reuse cached latents and only move the VAE to the device for misses.
+        latents, keys = [None] * len(path), [None] * len(path)
+        if self.image_cache is not None:
+            # Tiling and the fast path change the encoded values, see WanVAE.cache_options.
+            cache_id = hash_key(self.image_cache_id, *self.vae.cache_options())
+            for i, image_path in enumerate(path):
+                keys[i] = hash_key(cache_id, hash_file(image_path), size[0], size[1])
+                cached = self.image_cache.get(keys[i])
+                latents[i] = cached["latent"] if cached is not None else None
+        missing = [i for i, latent in enumerate(latents) if latent is None]
+        if missing:
+            with self.on_device(self.vae.model, device):
+                for i in missing:
+                    latents[i] = self.encode_image_latent(path[i], size, device)
+                    if self.image_cache is not None:
+                        self.image_cache.put(keys[i], {"latent": latents[i]})
+        latents = [latent.to(device) for latent in latents]
+
+        if len(latents) > 1:
+            return [torch.cat(latents, dim=1)]
+        return latents
+
+
+    def encode_image_latent(self, image_path, size, device):
         # Load size.
         h, w = size[1], size[0]
 
         # Load image.
-        if len(path) > 1 and not isinstance(path, str):
-            ref_vae_latents = []
-            for image_path in path:
-                with Image.open(image_path) as img:
-                    img = img.convert("RGB")
-
-                    # Calculate the required size to keep aspect ratio and fill the rest with padding.
-                    img_ratio = img.width / img.height
-                    target_ratio = w / h
-                    
-                    if img_ratio > target_ratio:  # Image is wider than target
-                        new_width = w
-                        new_height = int(new_width / img_ratio)
-                    else:  # Image is taller than target
-                        new_height = h
-                        new_width = int(new_height * img_ratio)
-                    
-                    # img = img.resize((new_width, new_height), Image.ANTIALIAS)
-                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    # Create a new image with the target size and place the resized image in the center
-                    delta_w = w - img.size[0]
-                    delta_h = h - img.size[1]
-                    padding = (delta_w // 2, delta_h // 2, delta_w - (delta_w // 2), delta_h - (delta_h // 2))
-                    new_img = ImageOps.expand(img, padding, fill=(255, 255, 255))
-
-                    # Transform to tensor and normalize.
-                    transform = Compose(
-                        [
-                            ToTensor(),
-                            Normalize(0.5, 0.5),
-                        ]
-                    )
-                    new_img = transform(new_img)
-                    # img_vae_latent = self.vae_encode([new_img.unsqueeze(1)])[0]
-                    img_vae_latent = self.vae.encode([new_img.unsqueeze(1)], device)
-                    ref_vae_latents.append(img_vae_latent[0])
-
-            return [torch.cat(ref_vae_latents, dim=1)]
-        else:
-            if not isinstance(path, str):
-                path = path[0]
-            with Image.open(path) as img:
-                img = img.convert("RGB")
-
-                # Calculate the required size to keep aspect ratio and fill the rest with padding.
-                img_ratio = img.width / img.height
-                target_ratio = w / h
-                
-                if img_ratio > target_ratio:  # Image is wider than target
-                    new_width = w
-                    new_height = int(new_width / img_ratio)
-                else:  # Image is taller than target
-                    new_height = h
-                    new_width = int(new_height * img_ratio)
-                
-                # img = img.resize((new_width, new_height), Image.ANTIALIAS)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                # Create a new image with the target size and place the resized image in the center
-                delta_w = w - img.size[0]
-                delta_h = h - img.size[1]
-                padding = (delta_w // 2, delta_h // 2, delta_w - (delta_w // 2), delta_h - (delta_h // 2))
-                new_img = ImageOps.expand(img, padding, fill=(255, 255, 255))
-
-                # Transform to tensor and normalize.
-                transform = Compose(
-                    [
-                        ToTensor(),
-                        Normalize(0.5, 0.5),
-                    ]
-                )
-                new_img = transform(new_img)
-                img_vae_latent = self.vae.encode([new_img.unsqueeze(1)], device)
-
-            # Vae encode.
-            return img_vae_latent
+        with Image.open(image_path) as img:
+            img = img.convert("RGB")
+
+            # Calculate the required size to keep aspect ratio and fill the rest with padding.
+            img_ratio = img.width / img.height
+            target_ratio = w / h
+            
+            if img_ratio > target_ratio:  # Image is wider than target
+                new_width = w
+                new_height = int(new_width / img_ratio)
+            else:  # Image is taller than target
+                new_height = h
+                new_width = int(new_height * img_ratio)
+            
+            # img = img.resize((new_width, new_height), Image.ANTIALIAS)
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+            # Create a new image with the target size and place the resized image in the center
+            delta_w = w - img.size[0]
+            delta_h = h - img.size[1]
+            padding = (delta_w // 2, delta_h // 2, delta_w - (delta_w // 2), delta_h - (delta_h // 2))
+            new_img = ImageOps.expand(img, padding, fill=(255, 255, 255))
+
+            # Transform to tensor and normalize.
+            new_img = image_transform(new_img)
+
+        # Vae encode.
+        return self.vae.encode([new_img.unsqueeze(1)], device)[0]
     
 
     def get_audio_emb_window(self, audio_emb, frame_num, frame0_idx, audio_shift=2):
@@ -293,60 +414,205 @@ class Generator():
         latent = output[0]
         mask = None
         return latent, mask
-    
 
-    def forward_tia(self, latents, timestep, t, step_change, arg_tia, arg_ti, arg_i, arg_null):
-        pos_tia, _ = self.parse_output(self.dit(
-            latents, t=timestep, **arg_tia
-            ))
-        torch.cuda.empty_cache()
 
-        pos_ti, _ = self.parse_output(self.dit(
-            latents, t=timestep, **arg_ti
-            ))
+    def forward_dit_batch(self, latents, timestep, args_list):
+        # Stack several guidance passes that share latents and timestep into one forward.
+        if len(args_list) == 1:
+            output = self.dit(latents, t=timestep, **args_list[0])
+        else:
+            num = len(args_list)
+            batch_args = {}
+            for key, value in args_list[0].items():
+                if isinstance(value, list):
+                    batch_args[key] = [u for args in args_list for u in args[key]]
+                else:
+                    assert all(args[key] == value for args in args_list)
+                    batch_args[key] = value
+            output = self.dit(latents * num, t=timestep.repeat(num), **batch_args)
         torch.cuda.empty_cache()
-
-        if t > step_change:
-            neg, _ = self.parse_output(self.dit(
-                latents, t=timestep, **arg_i
-                ))  # img included in null, same with official Wan-2.1
-            torch.cuda.empty_cache()
-
-            noise_pred = self.config.generation.scale_a * (pos_tia - pos_ti) + \
-                    self.config.generation.scale_t * (pos_ti - neg) + \
-                    neg
+        return output
+
+
+    def run_dit(self, latents, timestep, args_list):
+        """
+        Run the guidance passes in args_list, `generation.cfg_batch` of them per DiT forward.
+        On out-of-memory the batch size is lowered (3 -> 2+1 -> 1+1+1) for the rest of the run.
+        """
+        while True:
+            out_of_memory = False
+            try:
+                preds = []
+                for i in range(0, len(args_list), self.cfg_batch):
+                    preds.extend(self.forward_dit_batch(
+                        latents, timestep, args_list[i:i + self.cfg_batch]))
+                return preds
+            except torch.cuda.OutOfMemoryError:
+                if self.cfg_batch == 1:
+                    raise
+                out_of_memory = True
+            if out_of_memory:
+                # Free the failed attempt's activations outside the except block.
+                preds = None
+                torch.cuda.empty_cache()
+                self.cfg_batch -= 1
+                self.logger.warning(f"Out of memory with batched guidance, falling back to cfg_batch={self.cfg_batch}.")
+
+
+    def guidance_plan(self, mode, step_change):
+        """
+        Guidance stages for `mode`, from `generation.guidance_plan.<mode>` or the default schedule.
+        Each stage applies to min_t < t <= max_t (t runs from 1000 down to 0) and runs a chain of
+        branches b0..bn with scales s0..s(n-1): pred = s0 (b0 - b1) + ... + s(n-1) (b(n-1) - bn) + bn.
+        """
+        if mode not in ("TIA", "TA"):
+            raise ValueError(f"Unsupported generation mode: {mode}")
+        key = (mode, step_change)
+        if key in self.guidance_plans:
+            return self.guidance_plans[key]
+
+        scale_a, scale_t = self.config.generation.scale_a, self.config.generation.scale_t
+        plans = self.config.generation.get("guidance_plan", None) or {}
+        if plans.get(mode, None):
+            plan = [OmegaConf.to_container(stage) for stage in plans[mode]]
+        elif mode == "TIA":
+            plan = [
+                # img included in null, same with official Wan-2.1
+                {"min_t": step_change, "branches": ["tia", "ti", "i"], "scales": [scale_a, scale_t]},
+                # img not included in null
+                {"max_t": step_change, "branches": ["tia", "ti", "null"], "scales": [scale_a, scale_t - 2.0]},
+            ]
         else:
-            neg, _ = self.parse_output(self.dit(
-                latents, t=timestep, **arg_null
-                ))  # img not included in null
-            torch.cuda.empty_cache()
-
-            noise_pred = self.config.generation.scale_a * (pos_tia - pos_ti) + \
-                    (self.config.generation.scale_t - 2.0) * (pos_ti - neg) + \
-                    neg
+            plan = [{"branches": ["ta", "t", "null"], "scales": [scale_a, scale_t]}]
+
+        for stage in plan:
+            unknown = set(stage["branches"]) - {"tia", "ti", "i", "null", "ta", "t"}
+            if unknown or not stage["branches"]:
+                raise ValueError(f"Invalid guidance branches {stage['branches']}.")
+            if len(stage.get("scales", [])) != len(stage["branches"]) - 1:
+                raise ValueError(f"Guidance stage {stage} needs one scale less than branches.")
+        self.guidance_plans[key] = plan
+        return plan
+
+
+    def guidance_stage(self, plan, t):
+        for stage in plan:
+            if "min_t" in stage and not t > stage["min_t"]:
+                continue
+            if "max_t" in stage and not t <= stage["max_t"]:
+                continue
+            return stage
+        raise ValueError(f"No guidance stage covers timestep {float(t)}.")
+
+
+    def combine_guidance(self, stage, preds):
+        noise_pred = None
+        for scale, pred, next_pred in zip(stage["scales"], preds, preds[1:]):
+            term = scale * (pred - next_pred)
+            noise_pred = term if noise_pred is None else noise_pred + term
+        return preds[-1] if noise_pred is None else noise_pred + preds[-1]
+
+
+    def forward_guidance(self, latents, timestep, t, plan, args, state_key=None):
+        stage = self.guidance_stage(plan, t)
+        branches = stage["branches"]
+        delta_config = self.config.generation.get("guidance_delta", None)
+        if state_key is None or len(branches) == 1 or delta_config is None or not delta_config.get("enabled", False):
+            preds = self.run_dit(latents, timestep, [args[name] for name in branches])
+            self.guidance_passes += len(preds)
+            return self.combine_guidance(stage, preds)
+
+        # Reuse the guidance delta (guided prediction minus the first branch) between refreshes.
+        state = self.guidance_delta_states.get(state_key, None)
+        preds = []
+        if state is not None and state["stage"] is stage and state["age"] + 1 < delta_config.get("refresh_every", 2):
+            preds = self.run_dit(latents, timestep, [args[branches[0]]])
+            self.guidance_passes += 1
+            anchor = state["anchor"]
+            drift = ((preds[0] - anchor).norm() / anchor.norm().clamp_min(1e-8)).item()
+            if drift <= delta_config.get("drift_threshold", 0.1):
+                state["age"] += 1
+                self.guidance_reused += 1
+                return preds[0] + state["delta"]
+
+        done = len(preds)
+        preds += self.run_dit(latents, timestep, [args[name] for name in branches[done:]])
+        self.guidance_passes += len(branches) - done
+        noise_pred = self.combine_guidance(stage, preds)
+        self.guidance_delta_states[state_key] = {
+            "stage": stage, "delta": noise_pred - preds[0], "anchor": preds[0], "age": 0}
         return noise_pred
-    
-
-    def forward_ta(self, latents, timestep, arg_ta, arg_t, arg_null):
-        pos_ta, _ = self.parse_output(self.dit(
-            latents, t=timestep, **arg_ta
-            ))
-        torch.cuda.empty_cache()
 
-        pos_t, _ = self.parse_output(self.dit(
-            latents, t=timestep, **arg_t
-            ))
-        torch.cuda.empty_cache()
 
-        neg, _ = self.parse_output(self.dit(
-                latents, t=timestep, **arg_null
-                ))
-        torch.cuda.empty_cache()
-            
-        noise_pred = self.config.generation.scale_a * (pos_ta - pos_t) + \
-                self.config.generation.scale_t * (pos_t - neg) + \
-                neg
-        return noise_pred
+    def reset_sampling_state(self):
+        """
+        Drop the per-request conditioning, guidance deltas and step-cache residuals.
+        """
+        if self.dit.condition_cache is not None:
+            self.dit.condition_cache.clear()
+        self.guidance_delta_states = {}
+        if self.dit.step_cache is not None:
+            self.dit.step_cache.reset()
+
+
+    def forward_mode(self, mode, latents, timestep, t, step_change, args, state_key=None):
+        return self.forward_guidance(
+            latents, timestep, t, self.guidance_plan(mode, step_change), args, state_key=state_key)
+
+
+    def guidance_args(self, seq_len, audio_emb, audio_emb_neg, y_c, y_null, context, context_null, branch_prefix=""):
+        args = {
+            'null': {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_null, 'context': context_null},
+            't': {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_null, 'context': context},
+            'i': {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_c, 'context': context_null},
+            'ti': {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_c, 'context': context},
+            'ta': {'seq_len': seq_len, 'audio': audio_emb, 'y': y_null, 'context': context},
+            'tia': {'seq_len': seq_len, 'audio': audio_emb, 'y': y_c, 'context': context},
+        }
+        if self.dit.step_cache is not None:
+            # The step cache keeps its state per window and guidance branch.
+            for name, branch_args in args.items():
+                branch_args['step_cache_keys'] = [f"{branch_prefix}{name}"]
+        return args
+
+
+    def plan_windows(self, num_latents):
+        """
+        Split num_latents latent frames into overlapping [start, end) windows of
+        `generation.sliding_window.frames` pixel frames. Short clips get a single window.
+        Uses the fewest windows that keep at least `overlap` latents shared between
+        neighbours, shrunk to the shortest common length that still covers the clip and
+        spaced evenly, so a clip just over one window does not pay for two full ones.
+        """
+        window_config = self.config.generation.get("sliding_window", None)
+        if window_config is None or not window_config.get("enabled", True):
+            return [(0, num_latents)]
+        window = (window_config.frames - 1) // self.vae_stride[0] + 1
+        overlap = window_config.get("overlap", 4)
+        assert 0 <= overlap < window, "sliding_window.overlap must be smaller than the window."
+        if num_latents <= window:
+            return [(0, num_latents)]
+        count = math.ceil((num_latents - overlap) / (window - overlap))
+        window = math.ceil((num_latents + (count - 1) * overlap) / count)
+        starts = [round(i * (num_latents - window) / (count - 1)) for i in range(count)]
+        return [(start, start + window) for start in starts]
+
+
+    def window_blend_weights(self, windows, index, device):
+        # Linear ramps over the actual overlap with the neighbouring windows, ones elsewhere.
+        start, end = windows[index]
+        weight = torch.ones(end - start, device=device)
+        if index > 0:
+            overlap = windows[index - 1][1] - start
+            if overlap > 0:
+                weight[:overlap] = torch.arange(
+                    1, overlap + 1, device=device, dtype=torch.float32) / (overlap + 1)
+        if index < len(windows) - 1:
+            overlap = end - windows[index + 1][0]
+            if overlap > 0:
+                ramp = torch.arange(overlap, 0, -1, device=device, dtype=torch.float32) / (overlap + 1)
+                weight[-overlap:] = torch.minimum(weight[-overlap:], ramp)
+        return weight
 
 
     @torch.no_grad()
@@ -357,29 +623,34 @@ class Generator():
                  size=(1280, 720),
                  frame_num=81,
                  shift=5.0,
-                 sample_solver='unipc',
+                 sample_solver=None,
                  sampling_steps=50,
                  n_prompt="",
                  seed=-1,
                  offload_model=True,
                  device = get_device(),
+                 mode=None,
+                 decode=True,
         ):
+        """
+        Returns the decoded video [C, F, H, W], or the latent video [C, T, H/8, W/8]
+        when decode is False (see save_latent_video for streaming it to a file).
+        sample_solver overrides diffusion.sampler.type.
+        """
+        mode = mode or self.config.generation.mode
 
-        self.vae.model.to(device=device)
         if img_path is not None:
             latents_ref = self.load_image_latent_ref_id(img_path, size, device)
         else:
             latents_ref = [torch.zeros(16, 1, size[1]//8, size[0]//8).to(device)]
             
-        self.vae.model.to(device="cpu")
         latents_ref_neg = [torch.zeros_like(latent_ref) for latent_ref in latents_ref]
         
         # audio
         if audio_path is not None:
             if self.config.generation.extract_audio_feat:
-                self.audio_processor.whisper.to(device=device)
-                audio_emb, audio_length = self.audio_processor.preprocess(audio_path)
-                self.audio_processor.whisper.to(device='cpu')
+                audio_emb, audio_length = self.audio_processor.preprocess(
+                    audio_path, model_context=lambda: self.on_device(self.audio_processor.whisper, device))
             else:
                 audio_emb_path = audio_path.replace(".wav", ".pt")
                 audio_emb = torch.load(audio_emb_path).to(device=device)
@@ -390,22 +661,30 @@ class Generator():
             
         frame_num = frame_num if frame_num != -1 else audio_length
         frame_num = 4 * int((frame_num - 1) // 4) + 1
-        audio_emb, _ = self.get_audio_emb_window(audio_emb, frame_num, frame0_idx=0)
-        zero_audio_pad = torch.zeros(latents_ref[0].shape[1], *audio_emb.shape[1:]).to(audio_emb.device)
-        audio_emb = torch.cat([audio_emb, zero_audio_pad], dim=0)
-        audio_emb = [audio_emb.to(device)]
-        audio_emb_neg = [torch.zeros_like(audio_emb[0])]
+
+        # Long clips are denoised in overlapping latent windows, each with its own audio window.
+        num_latents = (frame_num - 1) // self.vae_stride[0] + 1
+        windows = self.plan_windows(num_latents)
+        window_latents = windows[0][1] - windows[0][0]
+        audio_emb_windows = []
+        for start, end in windows:
+            audio_emb_wind, _ = self.get_audio_emb_window(
+                audio_emb, 4 * (end - start - 1) + 1, frame0_idx=4 * start)
+            zero_audio_pad = torch.zeros(latents_ref[0].shape[1], *audio_emb_wind.shape[1:]).to(audio_emb_wind.device)
+            audio_emb_windows.append([torch.cat([audio_emb_wind, zero_audio_pad], dim=0).to(device)])
+        audio_emb_neg = [torch.zeros_like(audio_emb_windows[0][0])]
+        del audio_emb
         
         # preprocess
         self.patch_size = self.config.dit.model.patch_size
-        F = frame_num
-        target_shape = (self.vae.model.z_dim, (F - 1) // self.vae_stride[0] + 1 + latents_ref[0].shape[1],
+        target_shape = (self.vae.model.z_dim, num_latents + latents_ref[0].shape[1],
                         size[1] // self.vae_stride[1],
                         size[0] // self.vae_stride[2])
+        window_shape = (target_shape[0], window_latents + latents_ref[0].shape[1], *target_shape[2:])
 
-        seq_len = math.ceil((target_shape[2] * target_shape[3]) /
+        seq_len = math.ceil((window_shape[2] * window_shape[3]) /
                             (self.patch_size[1] * self.patch_size[2]) *
-                            target_shape[1] / self.sp_size) * self.sp_size
+                            window_shape[1] / self.sp_size) * self.sp_size
 
         if n_prompt == "":
             n_prompt = self.config.generation.sample_neg_prompt
@@ -413,10 +692,8 @@ class Generator():
         seed_g = torch.Generator(device=device)
         seed_g.manual_seed(seed)
 
-        self.text_encoder.model.to(device)
-        context = self.text_encoder([input_prompt], device)
-        context_null = self.text_encoder([n_prompt], device)
-        self.text_encoder.model.cpu()
+        context, context_null = self.encode_text([input_prompt, n_prompt], device)
+        context, context_null = [context], [context_null]
 
         noise = [
             torch.randn(
@@ -439,22 +716,23 @@ class Generator():
         # evaluation mode
         with amp.autocast("cuda", dtype=torch.bfloat16), torch.no_grad(), no_sync():
 
-            if sample_solver == 'unipc':
-                sample_scheduler = FlowUniPCMultistepScheduler(
-                    num_train_timesteps=1000,
-                    shift=1,
-                    use_dynamic_shifting=False)
-                sample_scheduler.set_timesteps(
-                    sampling_steps, device=device, shift=shift)
-                timesteps = sample_scheduler.timesteps
+            sampler = self.config.diffusion.sampler
+            sample_scheduler = build_sampler(
+                sample_solver or sampler.type, order=sampler.get("order", None))
+            sample_scheduler.set_timesteps(
+                sampling_steps, device=device, shift=shift)
+            timesteps = sample_scheduler.timesteps
 
             # sample videos
             latents = noise
 
-            msk = torch.ones(4, target_shape[1], target_shape[2], target_shape[3], device=get_device())
+            msk = torch.ones(4, window_shape[1], window_shape[2], window_shape[3], device=get_device())
             msk[:,:-latents_ref[0].shape[1]] = 0
 
-            zero_vae = self.zero_vae[:, :(target_shape[1]-latents_ref[0].shape[1])].to(
+            zero_vae_full = self.zero_vae.get(
+                window_shape[1], size[1], size[0], device,
+                model_context=lambda: self.on_device(self.vae.model, device))
+            zero_vae = zero_vae_full[:, :(window_shape[1]-latents_ref[0].shape[1])].to(
                 device=get_device(), dtype=latents_ref[0].dtype)
             y_c = torch.cat([
                 zero_vae,
@@ -462,53 +740,84 @@ class Generator():
                 ], dim=1)
             y_c = [torch.concat([msk, y_c])]
 
-            y_null = self.zero_vae[:, :target_shape[1]].to(
+            y_null = zero_vae_full[:, :window_shape[1]].to(
                 device=get_device(), dtype=latents_ref[0].dtype)
             y_null = [torch.concat([msk, y_null])]
 
-            arg_null = {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_null, 'context': context_null}
-            arg_t = {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_null, 'context': context}
-            arg_i = {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_c, 'context': context_null}
-            arg_ti = {'seq_len': seq_len, 'audio': audio_emb_neg, 'y': y_c, 'context': context}
-            arg_ta = {'seq_len': seq_len, 'audio': audio_emb, 'y': y_null, 'context': context}
-            arg_tia = {'seq_len': seq_len, 'audio': audio_emb, 'y': y_c, 'context': context}
+            window_args = [
+                self.guidance_args(seq_len, audio_emb_wind, audio_emb_neg, y_c, y_null, context, context_null,
+                                   branch_prefix=f"window{i}:")
+                for i, audio_emb_wind in enumerate(audio_emb_windows)
+            ]
+            if len(windows) > 1:
+                self.logger.info(f"Sliding windows: {len(windows)} windows of {window_latents} latent frames.")
+                ref_index = torch.arange(num_latents, target_shape[1], device=device)
+                window_index = [
+                    torch.cat([torch.arange(start, end, device=device), ref_index]) for start, end in windows
+                ]
+                window_weight = [
+                    torch.cat([self.window_blend_weights(windows, i, device),
+                               torch.ones_like(ref_index, dtype=torch.float32)]) for i in range(len(windows))
+                ]
             
             torch.cuda.empty_cache()
-            self.dit.to(device=get_device())
-            for _, t in enumerate(tqdm(timesteps)):
-                timestep = [t]
-                timestep = torch.stack(timestep)
-
-                if self.config.generation.mode == "TIA":
-                    noise_pred = self.forward_tia(latents, timestep, t, step_change, 
-                                                  arg_tia, arg_ti, arg_i, arg_null)
-                elif self.config.generation.mode == "TA":
-                    noise_pred = self.forward_ta(latents, timestep, arg_ta, arg_t, arg_null)
-                else:
-                    raise ValueError(f"Unsupported generation mode: {self.config.generation.mode}")
-
-                temp_x0 = sample_scheduler.step(
-                    noise_pred.unsqueeze(0),
-                    t,
-                    latents[0].unsqueeze(0),
-                    return_dict=False,
-                    generator=seed_g)[0]
-                latents = [temp_x0.squeeze(0)]
-
-                del timestep
-                torch.cuda.empty_cache()
+            self.guidance_passes = 0
+            self.guidance_reused = 0
+            self.guidance_delta_states = {}
+            with self.residency.use(self.dit):
+                try:
+                    for step, t in enumerate(tqdm(timesteps)):
+                        if self.dit.step_cache is not None:
+                            self.dit.step_cache.set_step(step, len(timesteps))
+                        timestep = [t]
+                        timestep = torch.stack(timestep)
+
+                        if len(windows) == 1:
+                            noise_pred = self.forward_mode(
+                                mode, latents, timestep, t, step_change, window_args[0], state_key=0)
+                        else:
+                            # Blend the window predictions in latent space.
+                            noise_pred = torch.zeros_like(latents[0])
+                            weight_sum = torch.zeros(target_shape[1], device=device)
+                            for i, (index, weight, args) in enumerate(zip(window_index, window_weight, window_args)):
+                                pred = self.forward_mode(
+                                    mode, [latents[0][:, index]], timestep, t, step_change, args, state_key=i)
+                                noise_pred.index_add_(1, index, pred * weight.view(1, -1, 1, 1))
+                                weight_sum.index_add_(0, index, weight)
+                                del pred
+                            noise_pred /= weight_sum.view(1, -1, 1, 1)
+
+                        temp_x0 = sample_scheduler.step(
+                            noise_pred.unsqueeze(0),
+                            t,
+                            latents[0].unsqueeze(0),
+                            return_dict=False,
+                            generator=seed_g)[0]
+                        latents = [temp_x0.squeeze(0)]
+
+                        del timestep
+                        torch.cuda.empty_cache()
+                    self.logger.info(
+                        f"Guidance: {self.guidance_passes} DiT passes for {len(timesteps)} steps x {len(windows)} windows, "
+                        f"{self.guidance_reused} with reused guidance deltas.")
+                    if self.dit.step_cache is not None:
+                        self.logger.info(self.dit.step_cache.report())
+                finally:
+                    # Also on failure, so the next request starts from a clean state.
+                    self.reset_sampling_state()
 
             x0 = latents
             x0 = [x0_[:,:-latents_ref[0].shape[1]] for x0_ in x0]
 
-            self.dit.cpu()
             torch.cuda.empty_cache()
-            self.vae.model.to(device=device)
-            videos = self.vae.decode(x0)
-            self.vae.model.to(device="cpu")
+            if decode:
+                with self.on_device(self.vae.model, device):
+                    videos = self.vae.decode(x0)
+            else:
+                videos = x0
 
         del noise, latents, noise_pred
-        del audio_emb, audio_emb_neg, latents_ref, latents_ref_neg, context, context_null
+        del audio_emb_windows, audio_emb_neg, window_args, latents_ref, latents_ref_neg, context, context_null
         del x0, temp_x0
         del sample_scheduler
         torch.cuda.empty_cache()
@@ -537,64 +846,89 @@ class Generator():
             if "A" not in self.config.generation.mode:
                 audio_path = None
 
-            video = self.inference(
+            latent = self.inference(
                 prompt.text,
                 ref_img_path,
                 audio_path,
                 size=(gen_config.width, gen_config.height),
                 frame_num=gen_config.frames,
                 shift=self.config.diffusion.timesteps.sampling.shift,
-                sample_solver='unipc',
                 sampling_steps=self.config.diffusion.timesteps.sampling.steps,
                 seed=seed,
                 offload_model=False,
+                decode=False,
             )
 
             torch.cuda.empty_cache()
             gc.collect()
             
-            # Save samples.
-            pathname = self.save_sample(
-                sample=video,
+            # Decode and save samples.
+            pathname = self.save_latent_video(
+                latent=latent,
                 audio_path=audio_path,
                 itemname=itemname,
             )
             self.logger.info(f"Finished {itemname}, saved to {pathname}.")
             
-            del video, prompt
+            del latent, prompt
             torch.cuda.empty_cache()
             gc.collect()
             
 
-    def save_sample(self, *, sample: torch.Tensor, audio_path: str, itemname: str):
+    def sample_path(self, itemname: str, seed: int, extension: str):
+        gen_config = self.config.generation
+        seed = seed if seed is not None else gen_config.seed
+        filename = f"{itemname}_seed{seed}"
+        filename += extension
+        return os.path.join(gen_config.output.dir, filename)
+
+
+    def save_latent_video(self, *, latent: torch.Tensor, audio_path: str, itemname: str, seed: int = None,
+                          device=get_device()):
+        """
+        Decode latent [C, T, H/8, W/8] chunk by chunk straight into the video writer,
+        without materializing the full float video.
+        """
+        pathname = self.sample_path(itemname, seed, ".mp4")
+        height, width = latent.shape[2] * self.vae_stride[1], latent.shape[3] * self.vae_stride[2]
+        with self.on_device(self.vae.model, device), FFmpegVideoWriter(
+                pathname, width, height, fps=self.config.generation.fps, audio_path=audio_path,
+                **self.video_encoder_options()) as writer:
+            for frames in self.vae.decode_frames(latent):
+                writer.write(frames)
+        return pathname
+
+
+    def save_sample(self, *, sample: torch.Tensor, audio_path: str, itemname: str, seed: int = None):
         gen_config = self.config.generation
         # Prepare file path.
         extension = ".mp4" if sample.ndim == 4 else ".png"
-        filename = f"{itemname}_seed{gen_config.seed}"
-        filename += extension
-        pathname = os.path.join(gen_config.output.dir, filename)
+        pathname = self.sample_path(itemname, seed, extension)
         # Convert sample.
         sample = sample.clip(-1, 1).mul_(0.5).add_(0.5).mul_(255).to("cpu", torch.uint8)
         sample = rearrange(sample, "c t h w -> t h w c")
         # Save file.
         if sample.ndim == 4:
-            if audio_path is not None:
-                tensor_to_video(
-                    sample.numpy(),
-                    pathname,
-                    audio_path,
-                    fps=gen_config.fps)
-            else:
-                mediapy.write_video(
-                path=pathname,
-                images=sample.numpy(),
+            tensor_to_video(
+                sample.numpy(),
+                pathname,
+                audio_path,
                 fps=gen_config.fps,
-            )
+                **self.video_encoder_options())
         else:
             raise ValueError
         return pathname
     
 
+    def video_encoder_options(self):
+        output_config = self.config.generation.output
+        return dict(
+            preset=output_config.get("preset", "medium"),
+            crf=output_config.get("crf", 23),
+            threads=output_config.get("threads", 0),
+        )
+    
+
     def prepare_positive_prompts(self):
         pos_prompts = self.config.generation.positive_prompt
         if pos_prompts.endswith(".json"):
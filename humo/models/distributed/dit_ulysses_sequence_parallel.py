@@ -25,7 +25,7 @@ from common.distributed.advanced import (
     gather_heads_scatter_seq,
     unpad_tensor
 )
-from humo.models.wan_modules.attention import flash_attention
+from humo.models.wan_modules.attention import dispatch_attention
 from humo.models.wan_modules.model_humo import rope_apply, sinusoidal_embedding_1d
 
 
@@ -144,8 +144,10 @@ def ulysses_attn_forward(
     seq_lens,
     grid_sizes,
     freqs,
-    dtype=torch.bfloat16
+    dtype=torch.bfloat16,
+    geometry=None,
 ):
+    # geometry plans describe the unsharded sequence and are not used here
     b, s, n, d = *x.shape[:2], self.num_heads, self.head_dim
     seq_len = seq_lens.max()
     half_dtypes = (torch.float16, torch.bfloat16)
@@ -187,12 +189,13 @@ def ulysses_attn_forward(
     q = rope_apply(q, grid_sizes, freqs)
     k = rope_apply(k, grid_sizes, freqs)
 
-    x = flash_attention(
+    x = dispatch_attention(
         q=half(q),
         k=half(k),
         v=half(v),
         k_lens=seq_lens,
-        window_size=self.window_size
+        window_size=self.window_size,
+        backend=self.attention_backend,
     )
 
     # ulysses support
@@ -253,11 +256,12 @@ def ulysses_audio_cross_attn_forward(
     k = k.reshape(-1, 16, pad_split_n, d)
     v = v.reshape(-1, 16, pad_split_n, d)
 
-    x = flash_attention(
+    x = dispatch_attention(
         q=q,
         k=k,
         v=v,
         k_lens=None,
+        backend=self.attention_backend,
     )
     x = x.view(b, -1, pad_split_n, d)
 
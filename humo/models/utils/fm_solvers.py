@@ -288,6 +288,10 @@ class FlowDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         # self.sigmas = self.sigmas.to(
         #     "cpu")  # to avoid too much CPU/GPU communication
 
+        # log-SNR of every sigma, computed once instead of in each solver update.
+        alphas, sigmas = self._sigma_to_alpha_sigma_t(self.sigmas)
+        self.lambdas = torch.log(alphas) - torch.log(sigmas)
+
     # Copied from diffusers.schedulers.scheduling_ddpm.DDPMScheduler._threshold_sample
     def _threshold_sample(self, sample: torch.Tensor) -> torch.Tensor:
         """
@@ -458,8 +462,8 @@ class FlowDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
             self.step_index]  # pyright: ignore
         alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(sigma_t)
         alpha_s, sigma_s = self._sigma_to_alpha_sigma_t(sigma_s)
-        lambda_t = torch.log(alpha_t) - torch.log(sigma_t)
-        lambda_s = torch.log(alpha_s) - torch.log(sigma_s)
+        lambda_t, lambda_s = self.lambdas[self.step_index + 1], self.lambdas[
+            self.step_index]  # pyright: ignore
 
         h = lambda_t - lambda_s
         if self.config.algorithm_type == "dpmsolver++":
@@ -526,19 +530,17 @@ class FlowDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
                 "Passing `prev_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
 
-        sigma_t, sigma_s0, sigma_s1 = (
-            self.sigmas[self.step_index + 1],  # pyright: ignore
-            self.sigmas[self.step_index],
-            self.sigmas[self.step_index - 1],  # pyright: ignore
-        )
+        sigma_t, sigma_s0 = self.sigmas[self.step_index + 1], self.sigmas[
+            self.step_index]  # pyright: ignore
 
         alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(sigma_t)
         alpha_s0, sigma_s0 = self._sigma_to_alpha_sigma_t(sigma_s0)
-        alpha_s1, sigma_s1 = self._sigma_to_alpha_sigma_t(sigma_s1)
 
-        lambda_t = torch.log(alpha_t) - torch.log(sigma_t)
-        lambda_s0 = torch.log(alpha_s0) - torch.log(sigma_s0)
-        lambda_s1 = torch.log(alpha_s1) - torch.log(sigma_s1)
+        lambda_t, lambda_s0, lambda_s1 = (
+            self.lambdas[self.step_index + 1],  # pyright: ignore
+            self.lambdas[self.step_index],
+            self.lambdas[self.step_index - 1],  # pyright: ignore
+        )
 
         m0, m1 = model_output_list[-1], model_output_list[-2]
 
@@ -636,22 +638,18 @@ class FlowDPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
                 "Passing `prev_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
 
-        sigma_t, sigma_s0, sigma_s1, sigma_s2 = (
-            self.sigmas[self.step_index + 1],  # pyright: ignore
-            self.sigmas[self.step_index],
-            self.sigmas[self.step_index - 1],  # pyright: ignore
-            self.sigmas[self.step_index - 2],  # pyright: ignore
-        )
+        sigma_t, sigma_s0 = self.sigmas[self.step_index + 1], self.sigmas[
+            self.step_index]  # pyright: ignore
 
         alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(sigma_t)
         alpha_s0, sigma_s0 = self._sigma_to_alpha_sigma_t(sigma_s0)
-        alpha_s1, sigma_s1 = self._sigma_to_alpha_sigma_t(sigma_s1)
-        alpha_s2, sigma_s2 = self._sigma_to_alpha_sigma_t(sigma_s2)
 
-        lambda_t = torch.log(alpha_t) - torch.log(sigma_t)
-        lambda_s0 = torch.log(alpha_s0) - torch.log(sigma_s0)
-        lambda_s1 = torch.log(alpha_s1) - torch.log(sigma_s1)
-        lambda_s2 = torch.log(alpha_s2) - torch.log(sigma_s2)
+        lambda_t, lambda_s0, lambda_s1, lambda_s2 = (
+            self.lambdas[self.step_index + 1],  # pyright: ignore
+            self.lambdas[self.step_index],
+            self.lambdas[self.step_index - 1],  # pyright: ignore
+            self.lambdas[self.step_index - 2],  # pyright: ignore
+        )
 
         m0, m1, m2 = model_output_list[-1], model_output_list[
             -2], model_output_list[-3]
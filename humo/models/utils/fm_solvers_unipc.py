@@ -226,6 +226,103 @@ class FlowUniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
         self.sigmas = self.sigmas.to(
             "cpu")  # to avoid too much CPU/GPU communication
 
+        # The UniP/UniC coefficients only depend on the schedule, so they are computed once
+        # here for the orders a full run uses instead of in every step().
+        alphas, sigmas = self._sigma_to_alpha_sigma_t(self.sigmas)
+        self.lambdas = torch.log(alphas) - torch.log(sigmas)
+        self.bh_coefficients = {}
+        if not self.solver_p:
+            for step_index in range(self.num_inference_steps):
+                self.uni_bh_coefficients(
+                    step_index, self.default_order(step_index), device=device)
+                if step_index > 0:
+                    self.uni_bh_coefficients(
+                        step_index,
+                        self.default_order(step_index - 1),
+                        corrector=True,
+                        device=device)
+
+    def default_order(self, step_index):
+        """
+        The UniP order step() uses at step_index when sampling the whole schedule.
+        """
+        order = self.config.solver_order
+        if self.config.lower_order_final:
+            order = min(order, self.num_inference_steps - step_index)
+        return min(order, step_index + 1)
+
+    def uni_bh_coefficients(self, step_index, order, corrector=False, device=None):
+        """
+        Coefficients of the UniP (or UniC, if corrector) update at step_index, memoized per
+        (step_index, order). The update is
+            x_t = x_coeff * x - m0_coeff * m0 - res_coeff * (rhos . D1s),
+        with D1s[k] = (m_k - m0) / rks[k] over the previous model outputs.
+
+        Returns:
+            (x_coeff, m0_coeff, res_coeff, rks, rhos), rhos is None for first-order UniP.
+        """
+        key = (step_index, order, corrector)
+        if key in self.bh_coefficients:
+            return self.bh_coefficients[key]
+
+        # UniP steps from sigma[i] to sigma[i + 1], UniC corrects the step from sigma[i - 1] to sigma[i].
+        t = step_index if corrector else step_index + 1
+        s0 = t - 1
+        alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(self.sigmas[t])
+        alpha_s0, sigma_s0 = self._sigma_to_alpha_sigma_t(self.sigmas[s0])
+        lambda_s0 = self.lambdas[s0]
+        h = self.lambdas[t] - lambda_s0
+
+        rks = [(self.lambdas[s0 - i] - lambda_s0) / h for i in range(1, order)]
+        R = []
+        b = []
+
+        hh = -h if self.predict_x0 else h
+        h_phi_1 = torch.expm1(hh)  # h\phi_1(h) = e^h - 1
+        h_phi_k = h_phi_1 / hh - 1
+
+        factorial_i = 1
+
+        if self.config.solver_type == "bh1":
+            B_h = hh
+        elif self.config.solver_type == "bh2":
+            B_h = torch.expm1(hh)
+        else:
+            raise NotImplementedError()
+
+        rks_all = torch.tensor(rks + [1.0], device=device)
+        for i in range(1, order + 1):
+            R.append(torch.pow(rks_all, i - 1))
+            b.append(h_phi_k * factorial_i / B_h)
+            factorial_i *= i + 1
+            h_phi_k = h_phi_k / hh - 1 / factorial_i
+
+        R = torch.stack(R)
+        b = torch.tensor(b, device=device)
+
+        if corrector:
+            # for order 1, we use a simplified version
+            if order == 1:
+                rhos = torch.tensor([0.5], device=device)
+            else:
+                rhos = torch.linalg.solve(R, b)
+        elif order == 1:
+            rhos = None
+        # for order 2, we use a simplified version
+        elif order == 2:
+            rhos = torch.tensor([0.5], device=device)
+        else:
+            rhos = torch.linalg.solve(R[:-1, :-1], b[:-1])
+
+        if self.predict_x0:
+            coefficients = (sigma_t / sigma_s0, alpha_t * h_phi_1,
+                            alpha_t * B_h, rks, rhos)
+        else:
+            coefficients = (alpha_t / alpha_s0, sigma_t * h_phi_1,
+                            sigma_t * B_h, rks, rhos)
+        self.bh_coefficients[key] = coefficients
+        return coefficients
+
     # Copied from diffusers.schedulers.scheduling_ddpm.DDPMScheduler._threshold_sample
     def _threshold_sample(self, sample: torch.Tensor) -> torch.Tensor:
         """
@@ -402,83 +499,16 @@ class FlowUniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
             x_t = self.solver_p.step(model_output, s0, x).prev_sample
             return x_t
 
-        sigma_t, sigma_s0 = self.sigmas[self.step_index + 1], self.sigmas[
-            self.step_index]  # pyright: ignore
-        alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(sigma_t)
-        alpha_s0, sigma_s0 = self._sigma_to_alpha_sigma_t(sigma_s0)
-
-        lambda_t = torch.log(alpha_t) - torch.log(sigma_t)
-        lambda_s0 = torch.log(alpha_s0) - torch.log(sigma_s0)
-
-        h = lambda_t - lambda_s0
-        device = sample.device
-
-        rks = []
-        D1s = []
-        for i in range(1, order):
-            si = self.step_index - i  # pyright: ignore
-            mi = model_output_list[-(i + 1)]
-            alpha_si, sigma_si = self._sigma_to_alpha_sigma_t(self.sigmas[si])
-            lambda_si = torch.log(alpha_si) - torch.log(sigma_si)
-            rk = (lambda_si - lambda_s0) / h
-            rks.append(rk)
-            D1s.append((mi - m0) / rk)  # pyright: ignore
-
-        rks.append(1.0)
-        rks = torch.tensor(rks, device=device)
-
-        R = []
-        b = []
-
-        hh = -h if self.predict_x0 else h
-        h_phi_1 = torch.expm1(hh)  # h\phi_1(h) = e^h - 1
-        h_phi_k = h_phi_1 / hh - 1
-
-        factorial_i = 1
-
-        if self.config.solver_type == "bh1":
-            B_h = hh
-        elif self.config.solver_type == "bh2":
-            B_h = torch.expm1(hh)
-        else:
-            raise NotImplementedError()
-
-        for i in range(1, order + 1):
-            R.append(torch.pow(rks, i - 1))
-            b.append(h_phi_k * factorial_i / B_h)
-            factorial_i *= i + 1
-            h_phi_k = h_phi_k / hh - 1 / factorial_i
-
-        R = torch.stack(R)
-        b = torch.tensor(b, device=device)
+        x_coeff, m0_coeff, res_coeff, rks, rhos_p = self.uni_bh_coefficients(
+            self.step_index, order, device=sample.device)  # pyright: ignore
 
-        if len(D1s) > 0:
-            D1s = torch.stack(D1s, dim=1)  # (B, K)
-            # for order 2, we use a simplified version
-            if order == 2:
-                rhos_p = torch.tensor([0.5], dtype=x.dtype, device=device)
-            else:
-                rhos_p = torch.linalg.solve(R[:-1, :-1],
-                                            b[:-1]).to(device).to(x.dtype)
-        else:
-            D1s = None
-
-        if self.predict_x0:
-            x_t_ = sigma_t / sigma_s0 * x - alpha_t * h_phi_1 * m0
-            if D1s is not None:
-                pred_res = torch.einsum("k,bkc...->bc...", rhos_p,
-                                        D1s)  # pyright: ignore
-            else:
-                pred_res = 0
-            x_t = x_t_ - alpha_t * B_h * pred_res
-        else:
-            x_t_ = alpha_t / alpha_s0 * x - sigma_t * h_phi_1 * m0
-            if D1s is not None:
-                pred_res = torch.einsum("k,bkc...->bc...", rhos_p,
-                                        D1s)  # pyright: ignore
-            else:
-                pred_res = 0
-            x_t = x_t_ - sigma_t * B_h * pred_res
+        x_t = x_coeff * x - m0_coeff * m0
+        if rhos_p is not None:
+            D1s = torch.stack([(model_output_list[-(i + 1)] - m0) / rk
+                               for i, rk in enumerate(rks, 1)], dim=1)  # (B, K)
+            pred_res = torch.einsum("k,bkc...->bc...",
+                                    rhos_p.to(x.device, x.dtype), D1s)
+            x_t = x_t - res_coeff * pred_res
 
         x_t = x_t.to(x.dtype)
         return x_t
@@ -542,86 +572,22 @@ class FlowUniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         m0 = model_output_list[-1]
         x = last_sample
-        x_t = this_sample
         model_t = this_model_output
 
-        sigma_t, sigma_s0 = self.sigmas[self.step_index], self.sigmas[
-            self.step_index - 1]  # pyright: ignore
-        alpha_t, sigma_t = self._sigma_to_alpha_sigma_t(sigma_t)
-        alpha_s0, sigma_s0 = self._sigma_to_alpha_sigma_t(sigma_s0)
-
-        lambda_t = torch.log(alpha_t) - torch.log(sigma_t)
-        lambda_s0 = torch.log(alpha_s0) - torch.log(sigma_s0)
-
-        h = lambda_t - lambda_s0
-        device = this_sample.device
-
-        rks = []
-        D1s = []
-        for i in range(1, order):
-            si = self.step_index - (i + 1)  # pyright: ignore
-            mi = model_output_list[-(i + 1)]
-            alpha_si, sigma_si = self._sigma_to_alpha_sigma_t(self.sigmas[si])
-            lambda_si = torch.log(alpha_si) - torch.log(sigma_si)
-            rk = (lambda_si - lambda_s0) / h
-            rks.append(rk)
-            D1s.append((mi - m0) / rk)  # pyright: ignore
-
-        rks.append(1.0)
-        rks = torch.tensor(rks, device=device)
-
-        R = []
-        b = []
-
-        hh = -h if self.predict_x0 else h
-        h_phi_1 = torch.expm1(hh)  # h\phi_1(h) = e^h - 1
-        h_phi_k = h_phi_1 / hh - 1
+        x_coeff, m0_coeff, res_coeff, rks, rhos_c = self.uni_bh_coefficients(
+            self.step_index, order, corrector=True,
+            device=this_sample.device)  # pyright: ignore
+        rhos_c = rhos_c.to(x.device, x.dtype)
 
-        factorial_i = 1
-
-        if self.config.solver_type == "bh1":
-            B_h = hh
-        elif self.config.solver_type == "bh2":
-            B_h = torch.expm1(hh)
+        x_t_ = x_coeff * x - m0_coeff * m0
+        if rks:
+            D1s = torch.stack([(model_output_list[-(i + 1)] - m0) / rk
+                               for i, rk in enumerate(rks, 1)], dim=1)
+            corr_res = torch.einsum("k,bkc...->bc...", rhos_c[:-1], D1s)
         else:
-            raise NotImplementedError()
-
-        for i in range(1, order + 1):
-            R.append(torch.pow(rks, i - 1))
-            b.append(h_phi_k * factorial_i / B_h)
-            factorial_i *= i + 1
-            h_phi_k = h_phi_k / hh - 1 / factorial_i
-
-        R = torch.stack(R)
-        b = torch.tensor(b, device=device)
-
-        if len(D1s) > 0:
-            D1s = torch.stack(D1s, dim=1)
-        else:
-            D1s = None
-
-        # for order 1, we use a simplified version
-        if order == 1:
-            rhos_c = torch.tensor([0.5], dtype=x.dtype, device=device)
-        else:
-            rhos_c = torch.linalg.solve(R, b).to(device).to(x.dtype)
-
-        if self.predict_x0:
-            x_t_ = sigma_t / sigma_s0 * x - alpha_t * h_phi_1 * m0
-            if D1s is not None:
-                corr_res = torch.einsum("k,bkc...->bc...", rhos_c[:-1], D1s)
-            else:
-                corr_res = 0
-            D1_t = model_t - m0
-            x_t = x_t_ - alpha_t * B_h * (corr_res + rhos_c[-1] * D1_t)
-        else:
-            x_t_ = alpha_t / alpha_s0 * x - sigma_t * h_phi_1 * m0
-            if D1s is not None:
-                corr_res = torch.einsum("k,bkc...->bc...", rhos_c[:-1], D1s)
-            else:
-                corr_res = 0
-            D1_t = model_t - m0
-            x_t = x_t_ - sigma_t * B_h * (corr_res + rhos_c[-1] * D1_t)
+            corr_res = 0
+        D1_t = model_t - m0
+        x_t = x_t_ - res_coeff * (corr_res + rhos_c[-1] * D1_t)
         x_t = x_t.to(x.dtype)
         return x_t
 
@@ -0,0 +1,334 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+import torch
+from torch import nn
+from torch.utils._python_dispatch import is_traceable_wrapper_subclass
+
+__all__ = ['PinnedModule', 'BlockSwapper', 'ResidencyManager']
+
+
+def pin_tensor(tensor):
+    """
+    Pin a CPU tensor, including the inner tensors of wrapper subclasses such as the
+    optimum-quanto int8 weights. Falls back to the pageable tensor if pinning fails.
+    """
+    try:
+        if is_traceable_wrapper_subclass(tensor):
+            names, ctx = tensor.__tensor_flatten__()
+            inner = {name: pin_tensor(getattr(tensor, name)) for name in names}
+            return type(tensor).__tensor_unflatten__(inner, ctx, tensor.size(), tensor.stride())
+        return tensor.pin_memory()
+    except (RuntimeError, NotImplementedError) as e:
+        logging.warning(f'Could not pin {type(tensor).__name__}: {e}')
+        return tensor
+
+
+def record_stream(tensor, stream):
+    """
+    Mark a device tensor, or the inner tensors of a wrapper subclass, as used by stream so
+    the caching allocator does not hand its memory out again before stream's work is done.
+    """
+    if is_traceable_wrapper_subclass(tensor):
+        names, _ = tensor.__tensor_flatten__()
+        for name in names:
+            record_stream(getattr(tensor, name), stream)
+    else:
+        tensor.record_stream(stream)
+
+
+def tensor_nbytes(tensor):
+    if is_traceable_wrapper_subclass(tensor):
+        names, _ = tensor.__tensor_flatten__()
+        return sum(tensor_nbytes(getattr(tensor, name)) for name in names)
+    return tensor.numel() * tensor.element_size()
+
+
+def module_nbytes(module):
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor_nbytes(tensor) for tensor in tensors)
+
+
+class PinnedModule:
+    """
+    Keeps one pinned CPU copy of a module's parameters and buffers. load() copies them to
+    the device (optionally on a side stream), evict() points the module back at the CPU
+    copy, so weights are never copied back to the host. Device copies made on a side
+    stream are recorded on the compute stream when evicted, so their memory is only
+    reused once the kernels reading them have finished.
+    """
+
+    def __init__(self, module: nn.Module, pin_memory=True):
+        self.module = module.cpu()
+        self.cpu_tensors = {}
+        for name, tensor in self.named_tensors():
+            self.cpu_tensors[name] = pin_tensor(tensor.detach()) if pin_memory else tensor.detach()
+            self.assign(name, self.cpu_tensors[name])
+        self.nbytes = module_nbytes(self.module)
+        self.device = torch.device('cpu')
+        self.event = None
+        self.stream = None
+
+    def named_tensors(self):
+        yield from self.module.named_parameters()
+        yield from self.module.named_buffers()
+
+    def assign(self, name, tensor):
+        owner_name, _, attr = name.rpartition('.')
+        owner = self.module.get_submodule(owner_name)
+        if attr in owner._parameters:
+            owner._parameters[attr] = nn.Parameter(tensor, requires_grad=False)
+        else:
+            owner._buffers[attr] = tensor
+
+    def load(self, device, stream=None):
+        device = torch.device(device)
+        if self.device == device:
+            return
+        use_stream = stream is not None and device.type == 'cuda'
+        with torch.cuda.stream(stream) if use_stream else nullcontext():
+            for name, tensor in self.cpu_tensors.items():
+                self.assign(name, tensor.to(device, non_blocking=True))
+            if use_stream:
+                self.event = torch.cuda.Event()
+                self.event.record(stream)
+        self.stream = stream if use_stream else None
+        self.device = device
+
+    def wait(self):
+        # Make the compute stream wait for an asynchronous load.
+        if self.event is not None:
+            torch.cuda.current_stream().wait_event(self.event)
+            self.event = None
+
+    def evict(self):
+        if self.device.type == 'cpu':
+            return
+        if self.stream is not None:
+            compute_stream = torch.cuda.current_stream(self.device)
+            for _, tensor in self.named_tensors():
+                record_stream(tensor.data, compute_stream)
+        for name, tensor in self.cpu_tensors.items():
+            self.assign(name, tensor)
+        self.device = torch.device('cpu')
+        self.event = None
+        self.stream = None
+
+
+class BlockSwapper:
+    """
+    Runs a model that lives in pinned CPU memory. While it is loaded, everything except the
+    blocks, plus the first resident_blocks blocks, stays on the device; these are copied on a
+    side stream and evicted for free like a PinnedModule. The remaining blocks
+    are streamed in ahead of use: when block i is about to run, the copies of blocks
+    i + 1 to i + prefetch_blocks are queued on a side stream, so they overlap with the
+    compute of block i, and block i is evicted as soon as it finishes. The prefetch wraps
+    around, so the next forward pass starts with its blocks already in flight.
+
+    Args:
+        model (nn.Module): Model that owns the blocks.
+        blocks (nn.ModuleList): Blocks to stream, e.g. WanModel.blocks.
+        resident_blocks (int): Blocks kept on the device permanently.
+        resident_gb (float): Alternative budget in GB for resident plus prefetched blocks.
+        prefetch_blocks (int): Blocks copied ahead of the one computing.
+    """
+
+    def __init__(self,
+                 model: nn.Module,
+                 blocks: nn.ModuleList,
+                 resident_blocks=0,
+                 resident_gb=None,
+                 prefetch_blocks=1,
+                 pin_memory=True):
+        self.model = model
+        pin_memory = pin_memory and torch.cuda.is_available()
+        self.blocks = [PinnedModule(block, pin_memory=pin_memory) for block in blocks]
+        self.others = [
+            PinnedModule(module, pin_memory=pin_memory) for module in model.children() if module is not blocks
+        ]
+        self.prefetch_blocks = max(int(prefetch_blocks), 1)
+        if resident_gb is not None:
+            block_bytes = max(block.nbytes for block in self.blocks)
+            resident_blocks = int(resident_gb * 2**30 // block_bytes) - self.prefetch_blocks - 1
+        self.resident_blocks = min(max(int(resident_blocks), 0), len(self.blocks))
+        self.streamed_blocks = len(self.blocks) - self.resident_blocks
+        self.prefetch_blocks = min(self.prefetch_blocks, max(self.streamed_blocks, 1))
+        self.device = torch.device('cpu')
+        self.stream = None
+        # Device footprint: everything but the streamed blocks, plus the computing block
+        # and the prefetched ones.
+        self.nbytes = sum(module.nbytes for module in self.others) + sum(
+            block.nbytes for block in self.blocks[:self.resident_blocks + self.prefetch_blocks + 1])
+        self.hooks = []
+        for i, block in enumerate(blocks):
+            self.hooks.append(block.register_forward_pre_hook(partial(self.pre_forward, i)))
+            self.hooks.append(block.register_forward_hook(partial(self.post_forward, i)))
+        logging.info(
+            f'Block swap: {self.resident_blocks} resident, {self.streamed_blocks} streamed, '
+            f'{self.prefetch_blocks} prefetched, {self.blocks[0].nbytes / 2**20:.0f}MB per block.')
+
+    def load(self, device, stream=None):
+        # Blocks are always streamed on the swapper's own stream.
+        self.device = torch.device(device)
+        if self.device.type == 'cuda' and self.stream is None:
+            self.stream = torch.cuda.Stream(self.device)
+        for module in self.others:
+            module.load(self.device, self.stream)
+        # Model-level buffers that are not registered (e.g. WanModel.freqs) move in forward.
+        for block in self.blocks[:self.resident_blocks]:
+            block.load(self.device, self.stream)
+        for i in range(self.resident_blocks, self.resident_blocks + self.prefetch_blocks):
+            if i < len(self.blocks):
+                self.prefetch(i)
+
+    def wait(self):
+        # Streamed blocks are awaited in pre_forward.
+        for module in self.others + self.blocks[:self.resident_blocks]:
+            module.wait()
+
+    def evict(self):
+        if self.device.type == 'cuda':
+            torch.cuda.current_stream(self.device).synchronize()
+        for module in self.others:
+            module.evict()
+        for block in self.blocks:
+            block.evict()
+        self.device = torch.device('cpu')
+
+    def prefetch(self, i):
+        # Memory of evicted blocks is protected by record_stream in PinnedModule.evict, so
+        # the copy does not have to wait for the compute stream.
+        block = self.blocks[i]
+        if block.device != self.device:
+            block.load(self.device, self.stream)
+
+    def pre_forward(self, i, module, args):
+        if self.device.type == 'cpu':
+            return
+        self.prefetch(i)
+        if i >= self.resident_blocks:
+            # Queued before block i's kernels, so the copies overlap with its compute.
+            for step in range(1, self.prefetch_blocks + 1):
+                offset = (i - self.resident_blocks + step) % self.streamed_blocks
+                self.prefetch(self.resident_blocks + offset)
+        self.blocks[i].wait()
+
+    def post_forward(self, i, module, args, output):
+        if self.device.type == 'cpu' or i < self.resident_blocks:
+            return
+        self.blocks[i].evict()
+
+    def remove(self):
+        for hook in self.hooks:
+            hook.remove()
+        self.hooks = []
+
+
+class ResidencyManager:
+    """
+    Owns the pipeline models (DiT, VAE, T5, Whisper) and decides which of them stay on the
+    device. Each model is kept in pinned CPU memory and copied on a side stream, so eviction
+    is free. Without a budget a model is evicted as soon as it is released; with budget_gb
+    models stay resident until loading another one would exceed the budget, and the least
+    recently used ones are evicted first.
+
+    Args:
+        device (torch.device): Compute device.
+        budget_gb (float): Device memory budget in GB for model weights, None to evict after use.
+        pin_memory (bool): Keep the CPU copies in pinned memory.
+    """
+
+    def __init__(self, device, budget_gb=None, pin_memory=True):
+        self.device = torch.device(device)
+        self.budget_bytes = None if budget_gb is None else int(budget_gb * 2**30)
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.handles = {}
+        self.names = {}
+        self.evict_hooks = {}
+        self.resident = OrderedDict()
+        self.in_use = set()
+        self.stream = None
+
+    def __contains__(self, module):
+        return id(module) in self.handles
+
+    def register(self, name, module, handle=None, on_evict=None):
+        """
+        Take ownership of a module. handle defaults to a PinnedModule; any object with
+        load(device, stream), wait(), evict() and nbytes (e.g. a BlockSwapper) works.
+        on_evict is called after the module is evicted, e.g. to drop device caches it owns.
+        """
+        if handle is None:
+            handle = PinnedModule(module, pin_memory=self.pin_memory)
+        self.handles[id(module)] = handle
+        self.names[id(module)] = name
+        if on_evict is not None:
+            self.evict_hooks[id(module)] = on_evict
+        logging.info(f'Residency: registered {name} ({handle.nbytes / 2**30:.2f}GB).')
+        return handle
+
+    def resident_bytes(self):
+        return sum(handle.nbytes for handle in self.resident.values())
+
+    def load(self, module):
+        key = id(module)
+        handle = self.handles[key]
+        if key not in self.resident:
+            self.make_room(handle.nbytes)
+            if self.device.type == 'cuda':
+                if self.stream is None:
+                    self.stream = torch.cuda.Stream(self.device)
+                # Memory freed by evicted models must not be overwritten before their kernels finish.
+                self.stream.wait_stream(torch.cuda.current_stream(self.device))
+            handle.load(self.device, self.stream)
+        self.resident[key] = handle
+        self.resident.move_to_end(key)
+        handle.wait()
+        return module
+
+    def release(self, module):
+        if self.budget_bytes is None and id(module) not in self.in_use:
+            self.evict(module)
+
+    def evict(self, module):
+        self.evict_key(id(module))
+
+    def evict_key(self, key):
+        handle = self.resident.pop(key, None)
+        if handle is not None:
+            handle.evict()
+            if key in self.evict_hooks:
+                self.evict_hooks[key]()
+
+    def make_room(self, nbytes):
+        if self.budget_bytes is None:
+            return
+        for key in list(self.resident):
+            if self.resident_bytes() + nbytes <= self.budget_bytes:
+                break
+            if key not in self.in_use:
+                logging.info(f'Residency: evicting {self.names[key]}.')
+                self.evict_key(key)
+
+    @contextmanager
+    def use(self, module):
+        self.load(module)
+        self.in_use.add(id(module))
+        try:
+            yield module
+        finally:
+            self.in_use.discard(id(module))
+            self.release(module)
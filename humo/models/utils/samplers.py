@@ -0,0 +1,173 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from diffusers.configuration_utils import ConfigMixin, register_to_config
+from diffusers.schedulers.scheduling_utils import SchedulerMixin, SchedulerOutput
+
+from .fm_solvers import FlowDPMSolverMultistepScheduler
+from .fm_solvers_unipc import FlowUniPCMultistepScheduler
+
+__all__ = [
+    'FlowEulerScheduler',
+    'build_sampler',
+    'register_sampler',
+    'SAMPLERS',
+]
+
+SAMPLERS = {}
+
+
+class FlowEulerScheduler(SchedulerMixin, ConfigMixin):
+    """
+    First-order flow matching sampler, x_{i+1} = x_i + (sigma_{i+1} - sigma_i) * v_i, on the
+    same shifted sigma schedule as the multistep solvers. Has the interface of
+    FlowUniPCMultistepScheduler (set_timesteps, timesteps, step).
+    """
+
+    order = 1
+
+    @register_to_config
+    def __init__(
+        self,
+        num_train_timesteps: int = 1000,
+        shift: Optional[float] = 1.0,
+    ):
+        sigmas = 1.0 - np.linspace(1, 1 / num_train_timesteps, num_train_timesteps)[::-1]
+        sigmas = shift * sigmas / (1 + (shift - 1) * sigmas)
+        self.sigma_min = float(sigmas[-1])
+        self.sigma_max = float(sigmas[0])
+        self.num_inference_steps = None
+        self._step_index = None
+
+    def set_timesteps(
+        self,
+        num_inference_steps: Union[int, None] = None,
+        device: Union[str, torch.device] = None,
+        sigmas: Optional[List[float]] = None,
+        shift: Optional[Union[float, None]] = None,
+    ):
+        if sigmas is None:
+            sigmas = np.linspace(self.sigma_max, self.sigma_min,
+                                 num_inference_steps + 1).copy()[:-1]
+        if shift is None:
+            shift = self.config.shift
+        sigmas = shift * np.asarray(sigmas) / (1 + (shift - 1) * np.asarray(sigmas))
+
+        timesteps = sigmas * self.config.num_train_timesteps
+        sigmas = np.concatenate([sigmas, [0]]).astype(np.float32)
+
+        self.sigmas = torch.from_numpy(sigmas)
+        self.timesteps = torch.from_numpy(timesteps).to(
+            device=device, dtype=torch.int64)
+        self.num_inference_steps = len(timesteps)
+        # Step sizes depend only on the schedule; python floats keep step() free of host syncs.
+        self.dts = (self.sigmas[1:] - self.sigmas[:-1]).tolist()
+        self._step_index = None
+
+    @property
+    def step_index(self):
+        return self._step_index
+
+    def index_for_timestep(self, timestep, schedule_timesteps=None):
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        indices = (schedule_timesteps == timestep).nonzero()
+        pos = 1 if len(indices) > 1 else 0
+        return indices[pos].item()
+
+    def step(self,
+             model_output: torch.Tensor,
+             timestep: Union[int, torch.Tensor],
+             sample: torch.Tensor,
+             return_dict: bool = True,
+             generator=None) -> Union[SchedulerOutput, Tuple]:
+        if self.num_inference_steps is None:
+            raise ValueError(
+                "Number of inference steps is 'None', you need to run 'set_timesteps' after creating the scheduler"
+            )
+        if self._step_index is None:
+            if isinstance(timestep, torch.Tensor):
+                timestep = timestep.to(self.timesteps.device)
+            self._step_index = self.index_for_timestep(timestep)
+
+        dt = self.dts[self._step_index]
+        prev_sample = sample.to(torch.float32) + dt * model_output.to(torch.float32)
+        prev_sample = prev_sample.to(model_output.dtype)
+        self._step_index += 1
+
+        if not return_dict:
+            return (prev_sample,)
+        return SchedulerOutput(prev_sample=prev_sample)
+
+    def scale_model_input(self, sample: torch.Tensor, *args, **kwargs) -> torch.Tensor:
+        return sample
+
+    def __len__(self):
+        return self.config.num_train_timesteps
+
+
+def register_sampler(name):
+    """
+    Register a sampler factory taking (order, num_train_timesteps) and returning a scheduler
+    with set_timesteps(steps, device=..., shift=...), timesteps and step().
+    """
+
+    def register(fn):
+        SAMPLERS[name] = fn
+        return fn
+
+    return register
+
+
+@register_sampler('euler')
+def euler_sampler(order=None, num_train_timesteps=1000):
+    return FlowEulerScheduler(num_train_timesteps=num_train_timesteps, shift=1)
+
+
+@register_sampler('dpm++2m')
+def dpmpp_2m_sampler(order=None, num_train_timesteps=1000):
+    return FlowDPMSolverMultistepScheduler(
+        num_train_timesteps=num_train_timesteps,
+        solver_order=2,
+        shift=1,
+        use_dynamic_shifting=False)
+
+
+@register_sampler('dpm++3m')
+def dpmpp_3m_sampler(order=None, num_train_timesteps=1000):
+    return FlowDPMSolverMultistepScheduler(
+        num_train_timesteps=num_train_timesteps,
+        solver_order=3,
+        shift=1,
+        use_dynamic_shifting=False)
+
+
+@register_sampler('unipc')
+def unipc_sampler(order=None, num_train_timesteps=1000):
+    return FlowUniPCMultistepScheduler(
+        num_train_timesteps=num_train_timesteps,
+        solver_order=order or 2,
+        shift=1,
+        use_dynamic_shifting=False)
+
+
+def build_sampler(name, order=None, num_train_timesteps=1000):
+    """
+    Build a registered sampler. order only applies to unipc, the DPM++ variants fix it by name.
+    """
+    if name not in SAMPLERS:
+        raise ValueError(f'Unknown sampler {name}, choose from {", ".join(SAMPLERS)}.')
+    return SAMPLERS[name](order=order, num_train_timesteps=num_train_timesteps)
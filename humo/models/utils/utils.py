@@ -4,38 +4,114 @@ import binascii
 import os
 import os.path as osp
 import json
+import shutil
+import subprocess
 from omegaconf import OmegaConf
 
 import imageio
+import numpy as np
 import torch
 import torchvision
-from moviepy.editor import AudioFileClip, VideoClip
 
-__all__ = ['tensor_to_video', 'prepare_json_dataset']
-    
+__all__ = ['FFmpegVideoWriter', 'tensor_to_video', 'prepare_json_dataset']
+
+
+def get_ffmpeg_exe():
+    exe = shutil.which("ffmpeg")
+    if exe is None:
+        import imageio_ffmpeg
+        exe = imageio_ffmpeg.get_ffmpeg_exe()
+    return exe
+
+
+class FFmpegVideoWriter:
+    """
+    Streams uint8 RGB frames into an ffmpeg subprocess through a pipe and muxes an optional
+    audio track in the same process. Audio and video are trimmed to the shorter of the two.
+
+    Args:
+        output_video_path (str): The file path where the output video will be saved.
+        width (int), height (int): Frame size.
+        fps (int): The frame rate of the output video.
+        audio_path (str): Optional audio file to mux.
+        preset (str): x264 preset, e.g. "ultrafast", "veryfast", "medium".
+        crf (int): x264 constant rate factor.
+        threads (int): Encoder threads, 0 lets x264 pick.
+    """
+
+    def __init__(self,
+                 output_video_path,
+                 width,
+                 height,
+                 fps=25,
+                 audio_path=None,
+                 preset="medium",
+                 crf=23,
+                 threads=0,
+                 codec="libx264"):
+        cmd = [
+            get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-r", str(fps), "-i", "-"
+        ]
+        if audio_path is not None:
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:a", "aac", "-shortest"]
+        cmd += [
+            "-c:v", codec, "-preset", preset, "-crf", str(crf), "-threads", str(threads),
+            "-pix_fmt", "yuv420p", output_video_path
+        ]
+        self.output_video_path = output_video_path
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frames):
+        """
+        frames: uint8 array or tensor shaped [f, h, w, c] (or a single [h, w, c] frame).
+        """
+        if isinstance(frames, torch.Tensor):
+            frames = frames.cpu().numpy()
+        frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        try:
+            self.process.stdin.write(memoryview(frames).cast("B"))
+        except BrokenPipeError:
+            # ffmpeg exited early, e.g. on a bad codec or output path.
+            self.close()
+            raise RuntimeError(f"ffmpeg exited early writing {self.output_video_path}")
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self.process.stderr.read()
+        ret = self.process.wait()
+        self.process = None
+        if ret != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.output_video_path}: {stderr.decode(errors='ignore')}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
 
-def tensor_to_video(tensor, output_video_path, input_audio_path, fps=25):
+def tensor_to_video(tensor, output_video_path, input_audio_path=None, fps=25, chunk_size=64, **kwargs):
     """
-    Converts a Tensor with shape [c, f, h, w] into a video and adds an audio track from the specified audio file.
+    Converts a Tensor with shape [f, h, w, c] into a video and adds an audio track from the specified audio file.
 
     Args:
         tensor (numpy): The Tensor to be converted, shaped [f, h, w, c].
         output_video_path (str): The file path where the output video will be saved.
         input_audio_path (str): The path to the audio file (WAV file) that contains the audio track to be added.
-        fps (int): The frame rate of the output video. Default is 30 fps.
+        fps (int): The frame rate of the output video. Default is 25 fps.
+        kwargs: Encoder options forwarded to FFmpegVideoWriter (preset, crf, threads).
     """
-    def make_frame(t):
-        frame_index = min(int(t * fps), tensor.shape[0] - 1)
-        return tensor[frame_index]
-
-    video_duration = tensor.shape[0] / fps
-    audio_clip = AudioFileClip(input_audio_path)
-    audio_duration = audio_clip.duration
-    final_duration = min(video_duration, audio_duration)
-    audio_clip = audio_clip.subclip(0, final_duration)
-    new_video_clip = VideoClip(make_frame, duration=final_duration)
-    new_video_clip = new_video_clip.set_audio(audio_clip)
-    new_video_clip.write_videofile(output_video_path, fps=fps, audio_codec="aac")
+    with FFmpegVideoWriter(output_video_path, tensor.shape[2], tensor.shape[1], fps=fps,
+                           audio_path=input_audio_path, **kwargs) as writer:
+        for i in range(0, tensor.shape[0], chunk_size):
+            writer.write(tensor[i:i + chunk_size])
 
 
 def prepare_json_dataset(json_path):
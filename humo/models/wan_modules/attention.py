@@ -1,5 +1,9 @@
 # Copyright 2024-2025 The Alibaba Wan Team Authors. All rights reserved.
+import math
+from functools import lru_cache
+
 import torch
+import torch.nn.functional as F
 
 try:
     import flash_attn_interface
@@ -18,8 +22,69 @@ import warnings
 __all__ = [
     'flash_attention',
     'attention',
+    'sdpa_attention',
+    'math_attention',
+    'dispatch_attention',
+    'register_attention_backend',
+    'ATTENTION_BACKENDS',
 ]
 
+ATTENTION_BACKENDS = {}
+
+# Memory budget of one query chunk in math_attention.
+MATH_ATTENTION_CHUNK_MB = 512
+
+
+def register_attention_backend(name):
+    """
+    Register an attention function taking [B, L, N, C] q/k/v and the keyword
+    arguments of flash_attention, returning [B, Lq, N, C] in the dtype of q.
+    """
+
+    def register(fn):
+        ATTENTION_BACKENDS[name] = fn
+        return fn
+
+    return register
+
+
+def resolve_attention_backend(name, device):
+    if name != 'auto':
+        return name
+    if device.type == 'cuda':
+        if FLASH_ATTN_3_AVAILABLE:
+            return 'fa3'
+        if FLASH_ATTN_2_AVAILABLE:
+            return 'fa2'
+        return 'sdpa'
+    return 'math'
+
+
+def check_attention_backend(name):
+    if name != 'auto' and name not in ATTENTION_BACKENDS:
+        raise ValueError(
+            f'Unknown attention backend {name}, choose from auto, {", ".join(ATTENTION_BACKENDS)}.')
+    if name == 'fa3' and not FLASH_ATTN_3_AVAILABLE:
+        raise ValueError('Attention backend fa3 requires flash_attn_interface.')
+    if name == 'fa2' and not FLASH_ATTN_2_AVAILABLE:
+        raise ValueError('Attention backend fa2 requires flash_attn.')
+    return name
+
+
+def dispatch_attention(q, k, v, backend='auto', **kwargs):
+    """
+    Run attention with a registered backend, 'auto' picks FA3, FA2 or SDPA on CUDA
+    and the chunked math kernel elsewhere.
+    """
+    return ATTENTION_BACKENDS[resolve_attention_backend(backend, q.device)](q, k, v, **kwargs)
+
+
+@lru_cache(maxsize=64)
+def uniform_cu_seqlens(batch_size, seq_len, device):
+    # Cumulative lengths of an unpadded batch, built on the device once per shape.
+    return torch.arange(
+        0, (batch_size + 1) * seq_len, seq_len, dtype=torch.int32, device=device)
+
 
 def flash_attention(
     q,
@@ -35,6 +100,8 @@ def flash_attention(
     deterministic=False,
     dtype=torch.bfloat16,
     version=None,
+    cu_seqlens_q=None,
+    cu_seqlens_k=None,
 ):
     """
     q:              [B, Lq, Nq, C1].
@@ -48,6 +115,8 @@ def flash_attention(
     window_size:    (left right). If not (-1, -1), apply sliding window local attention.
     deterministic:  bool. If True, slightly slower and uses more memory.
     dtype:          torch.dtype. Apply when dtype of q/k/v is not float16/bfloat16.
+    cu_seqlens_q:   [B + 1] int32 on the device, precomputed from q_lens.
+    cu_seqlens_k:   [B + 1] int32 on the device, precomputed from k_lens.
     """
     half_dtypes = (torch.float16, torch.bfloat16)
     assert dtype in half_dtypes
@@ -63,22 +132,26 @@ def flash_attention(
     # preprocess query
     if q_lens is None:
         q = half(q.flatten(0, 1))
-        q_lens = torch.tensor(
-            [lq] * b, dtype=torch.int32).to(
-                device=q.device, non_blocking=True)
+        if cu_seqlens_q is None:
+            cu_seqlens_q = uniform_cu_seqlens(b, lq, q.device)
     else:
         q = half(torch.cat([u[:v] for u, v in zip(q, q_lens)]))
+        if cu_seqlens_q is None:
+            cu_seqlens_q = torch.cat([q_lens.new_zeros([1]), q_lens]).cumsum(
+                0, dtype=torch.int32).to(q.device, non_blocking=True)
 
     # preprocess key, value
     if k_lens is None:
         k = half(k.flatten(0, 1))
         v = half(v.flatten(0, 1))
-        k_lens = torch.tensor(
-            [lk] * b, dtype=torch.int32).to(
-                device=k.device, non_blocking=True)
+        if cu_seqlens_k is None:
+            cu_seqlens_k = uniform_cu_seqlens(b, lk, k.device)
     else:
         k = half(torch.cat([u[:v] for u, v in zip(k, k_lens)]))
         v = half(torch.cat([u[:v] for u, v in zip(v, k_lens)]))
+        if cu_seqlens_k is None:
+            cu_seqlens_k = torch.cat([k_lens.new_zeros([1]), k_lens]).cumsum(
+                0, dtype=torch.int32).to(q.device, non_blocking=True)
 
     q = q.to(v.dtype)
     k = k.to(v.dtype)
@@ -98,10 +171,8 @@ def flash_attention(
             q=q,
             k=k,
             v=v,
-            cu_seqlens_q=torch.cat([q_lens.new_zeros([1]), q_lens]).cumsum(
-                0, dtype=torch.int32).to(q.device, non_blocking=True),
-            cu_seqlens_k=torch.cat([k_lens.new_zeros([1]), k_lens]).cumsum(
-                0, dtype=torch.int32).to(q.device, non_blocking=True),
+            cu_seqlens_q=cu_seqlens_q,
+            cu_seqlens_k=cu_seqlens_k,
             seqused_q=None,
             seqused_k=None,
             max_seqlen_q=lq,
@@ -115,10 +186,8 @@ def flash_attention(
             q=q,
             k=k,
             v=v,
-            cu_seqlens_q=torch.cat([q_lens.new_zeros([1]), q_lens]).cumsum(
-                0, dtype=torch.int32).to(q.device, non_blocking=True),
-            cu_seqlens_k=torch.cat([k_lens.new_zeros([1]), k_lens]).cumsum(
-                0, dtype=torch.int32).to(q.device, non_blocking=True),
+            cu_seqlens_q=cu_seqlens_q,
+            cu_seqlens_k=cu_seqlens_k,
             max_seqlen_q=lq,
             max_seqlen_k=lk,
             dropout_p=dropout_p,
@@ -131,6 +200,117 @@ def flash_attention(
     return x.type(out_dtype)
 
 
+@register_attention_backend('fa3')
+def fa3_attention(q, k, v, **kwargs):
+    return flash_attention(q, k, v, version=3, **kwargs)
+
+
+@register_attention_backend('fa2')
+def fa2_attention(q, k, v, **kwargs):
+    return flash_attention(q, k, v, version=2, **kwargs)
+
+
+def _varlen_slices(b, lq, lk, q_lens, k_lens):
+    q_lens = [lq] * b if q_lens is None else q_lens.tolist()
+    k_lens = [lk] * b if k_lens is None else k_lens.tolist()
+    return zip(range(b), q_lens, k_lens)
+
+
+@register_attention_backend('sdpa')
+def sdpa_attention(
+    q,
+    k,
+    v,
+    q_lens=None,
+    k_lens=None,
+    dropout_p=0.,
+    softmax_scale=None,
+    q_scale=None,
+    causal=False,
+    window_size=(-1, -1),
+    dtype=torch.bfloat16,
+    **kwargs,
+):
+    """
+    PyTorch scaled_dot_product_attention. Padded batches are sliced per sample, so
+    keys beyond k_lens are masked exactly like the flash-attn varlen kernels.
+    """
+    if tuple(window_size) != (-1, -1):
+        raise NotImplementedError('sdpa attention does not support window_size.')
+    half_dtypes = (torch.float16, torch.bfloat16)
+    b, lq, lk, out_dtype = q.size(0), q.size(1), k.size(1), q.dtype
+
+    def half(x):
+        return x if x.dtype in half_dtypes else x.to(dtype)
+
+    def run(q, k, v):
+        v = half(v)
+        q = half(q if q_scale is None else q * q_scale).to(v.dtype)
+        k = half(k).to(v.dtype)
+        x = F.scaled_dot_product_attention(
+            q.transpose(1, 2),
+            k.transpose(1, 2),
+            v.transpose(1, 2),
+            dropout_p=dropout_p,
+            is_causal=causal,
+            scale=softmax_scale)
+        return x.transpose(1, 2)
+
+    if q_lens is None and k_lens is None:
+        return run(q, k, v).contiguous().type(out_dtype)
+
+    out = q.new_zeros(b, lq, q.size(2), v.size(3), dtype=out_dtype)
+    for i, q_len, k_len in _varlen_slices(b, lq, lk, q_lens, k_lens):
+        out[i:i + 1, :q_len] = run(q[i:i + 1, :q_len], k[i:i + 1, :k_len], v[i:i + 1, :k_len])
+    return out
+
+
+@register_attention_backend('math')
+def math_attention(
+    q,
+    k,
+    v,
+    q_lens=None,
+    k_lens=None,
+    softmax_scale=None,
+    q_scale=None,
+    causal=False,
+    window_size=(-1, -1),
+    chunk_mb=None,
+    **kwargs,
+):
+    """
+    Reference attention in float32 that runs on any device. Queries are processed in
+    chunks so the score matrix stays within chunk_mb (MATH_ATTENTION_CHUNK_MB).
+    """
+    if tuple(window_size) != (-1, -1):
+        raise NotImplementedError('math attention does not support window_size.')
+    b, lq, lk, n, out_dtype = q.size(0), q.size(1), k.size(1), q.size(2), q.dtype
+    scale = softmax_scale if softmax_scale is not None else q.size(-1)**-0.5
+    budget = (chunk_mb or MATH_ATTENTION_CHUNK_MB) * 2**20
+
+    out = q.new_zeros(b, lq, n, v.size(3), dtype=out_dtype)
+    for i, q_len, k_len in _varlen_slices(b, lq, lk, q_lens, k_lens):
+        k_i = k[i, :k_len].transpose(0, 1).float()
+        v_i = v[i, :k_len].transpose(0, 1).float()
+        # scores and probabilities of one chunk, float32
+        chunk = max(1, budget // (n * max(k_len, 1) * 4 * 2))
+        for start in range(0, q_len, chunk):
+            end = min(start + chunk, q_len)
+            q_i = q[i, start:end].transpose(0, 1).float()
+            if q_scale is not None:
+                q_i = q_i * q_scale
+            scores = torch.matmul(q_i, k_i.transpose(1, 2)).mul_(scale)
+            if causal:
+                # bottom-right aligned, as in flash-attn
+                rows = torch.arange(start, end, device=q.device).view(-1, 1) + (k_len - q_len)
+                cols = torch.arange(k_len, device=q.device).view(1, -1)
+                scores.masked_fill_(cols > rows, -math.inf)
+            x = torch.matmul(scores.softmax(dim=-1), v_i)
+            out[i, start:end] = x.transpose(0, 1).to(out_dtype)
+    return out
+
+
 def attention(
     q,
     k,
@@ -163,18 +343,16 @@ def attention(
             version=fa_version,
         )
     else:
-        if q_lens is not None or k_lens is not None:
-            warnings.warn(
-                'Padding mask is disabled when using scaled_dot_product_attention. It can have a significant impact on performance.'
-            )
-        attn_mask = None
-
-        q = q.transpose(1, 2).to(dtype)
-        k = k.transpose(1, 2).to(dtype)
-        v = v.transpose(1, 2).to(dtype)
-
-        out = torch.nn.functional.scaled_dot_product_attention(
-            q, k, v, attn_mask=attn_mask, is_causal=causal, dropout_p=dropout_p)
-
-        out = out.transpose(1, 2).contiguous()
-        return out
+        return sdpa_attention(
+            q=q,
+            k=k,
+            v=v,
+            q_lens=q_lens,
+            k_lens=k_lens,
+            dropout_p=dropout_p,
+            softmax_scale=softmax_scale,
+            q_scale=q_scale,
+            causal=causal,
+            window_size=window_size,
+            dtype=dtype,
+        )
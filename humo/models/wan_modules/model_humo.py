@@ -6,7 +6,9 @@ from models.audio.audio_proj import AudioProjModel
 
 import torch.amp as amp
 import math
-from humo.models.wan_modules.attention import flash_attention
+from collections import OrderedDict
+from itertools import accumulate
+from humo.models.wan_modules.attention import check_attention_backend, dispatch_attention
 from common.distributed.advanced import is_unified_parallel_initialized
 
 import types
@@ -66,6 +68,293 @@ def rope_apply(x, grid_sizes, freqs):
     return torch.stack(output).float()
 
 
+@amp.autocast("cuda", enabled=False)
+def rope_table(grid_size, seq_len, freqs):
+    r"""
+    Real cos/sin RoPE tables of shape [seq_len, 1, C / num_heads / 2] for one (F, H, W)
+    grid. Padding positions get cos=1 and sin=0, so they pass through unrotated.
+    """
+    f, h, w = grid_size
+    c = freqs.size(1)
+    freqs = freqs.split([c - 2 * (c // 3), c // 3, c // 3], dim=1)
+    freqs = torch.cat([
+        freqs[0][:f].view(f, 1, 1, -1).expand(f, h, w, -1),
+        freqs[1][:h].view(1, h, 1, -1).expand(f, h, w, -1),
+        freqs[2][:w].view(1, 1, w, -1).expand(f, h, w, -1)
+    ],
+                      dim=-1).reshape(f * h * w, 1, -1)
+    pad = seq_len - f * h * w
+    cos = torch.cat([freqs.real, freqs.real.new_ones(pad, 1, c)])
+    sin = torch.cat([freqs.imag, freqs.imag.new_zeros(pad, 1, c)])
+    return cos, sin
+
+
+class GeometryPlan:
+    r"""
+    Per-shape constants shared by every block of a forward pass: real RoPE tables for
+    the (F, H, W) grids and the self-attention lengths. Without padding, k_lens is None
+    so attention takes the no-copy path.
+    """
+
+    def __init__(self, grid_sizes, seq_len, freqs, device):
+        grids = [tuple(g) for g in grid_sizes.tolist()]
+        lens = [math.prod(g) for g in grids]
+        self.grid_sizes = grid_sizes
+        self.seq_lens = torch.tensor(lens, dtype=torch.long, device=device)
+        if all(length == seq_len for length in lens):
+            self.k_lens = None
+            self.cu_seqlens_k = None
+        else:
+            self.k_lens = self.seq_lens
+            self.cu_seqlens_k = torch.tensor(
+                [0, *accumulate(lens)], dtype=torch.int32, device=device)
+
+        # One table broadcast over the batch when all samples share a grid.
+        tables = {g: rope_table(g, seq_len, freqs) for g in set(grids)}
+        if len(tables) == 1:
+            self.cos, self.sin = (t.unsqueeze(0) for t in tables[grids[0]])
+        else:
+            self.cos = torch.stack([tables[g][0] for g in grids])
+            self.sin = torch.stack([tables[g][1] for g in grids])
+
+    @amp.autocast("cuda", enabled=False)
+    def rope(self, x):
+        r"""
+        Same result as rope_apply, x is [B, L, num_heads, C / num_heads].
+        """
+        x = x.float().unflatten(-1, (-1, 2))
+        x0, x1 = x[..., 0], x[..., 1]
+        return torch.stack([
+            x0 * self.cos - x1 * self.sin,
+            x0 * self.sin + x1 * self.cos
+        ],
+                           dim=-1).flatten(3)
+
+
+class ConditionEntry:
+
+    def __init__(self, embedded, shared=False):
+        self.embedded = embedded
+        self.shared = shared
+        self.kv = {}
+        self.nbytes = embedded.numel() * embedded.element_size()
+
+    def to(self, device):
+        self.embedded = self.embedded.to(device, non_blocking=True)
+        self.kv = {
+            attn: tuple(t.to(device, non_blocking=True) for t in kv) for attn, kv in self.kv.items()
+        }
+        return self
+
+
+class CachedCondition:
+    r"""
+    Batch of cached conditions passed to the blocks in place of the context tensor.
+    Cross-attention layers take their K/V from kv() instead of projecting the context.
+    Conditions shorter than length are zero-padded like the uncached path, their K/V
+    are computed on the fly.
+    """
+
+    def __init__(self, cache, entries):
+        self.cache = cache
+        self.entries = entries
+        self.length = max(entry.embedded.size(1) for entry in entries)
+
+    def kv(self, attn):
+        keys, values = [], []
+        for entry in self.entries:
+            kv = entry.kv.get(attn, None)
+            if kv is None:
+                embedded = entry.embedded
+                if embedded.size(1) < self.length:
+                    embedded = torch.cat([embedded, embedded.new_zeros(
+                        1, self.length - embedded.size(1), embedded.size(2))], dim=1)
+                kv = (attn.norm_k(attn.k(embedded)), attn.v(embedded))
+                if embedded is entry.embedded:
+                    self.cache.store(entry, attn, kv)
+            keys.append(kv[0])
+            values.append(kv[1])
+        if len(keys) == 1:
+            return keys[0], values[0]
+        return torch.cat(keys), torch.cat(values)
+
+
+class ConditionCache:
+    r"""
+    Conditioning that is constant across denoising steps: the embedded text and audio
+    tokens and the cross-attention K/V of every block. Entries are keyed by the identity
+    of the input tensors, so the caller passes the same tensor objects on every step and
+    clears the cache between requests. K/V are computed the first time a block sees a
+    condition, which also works when blocks are streamed to the device; beyond
+    max_memory_mb they are recomputed instead of stored.
+
+    All-zero conditions (the negative audio) only depend on their shape, so they can be
+    kept in a shared store that survives clear(), bounded by shared_memory_mb. offload()
+    moves that store to the CPU while the model is off the device, the next request
+    copies an entry back when it needs it.
+    """
+
+    def __init__(self, max_memory_mb=2048, shared_memory_mb=2048):
+        self.max_bytes = int(max_memory_mb * 2**20)
+        self.shared_max_bytes = int(shared_memory_mb * 2**20)
+        self.entries = OrderedDict()
+        self.shared = OrderedDict()
+        self.nbytes = 0
+        self.shared_nbytes = 0
+
+    def get(self, source, embed, shared_name=None):
+        key = id(source)
+        item = self.entries.get(key, None)
+        # Holding the source keeps its id from being reused while the item lives.
+        if item is None or item[0] is not source:
+            if shared_name is not None and not source.any():
+                entry = self.get_shared(shared_name, source, embed)
+            else:
+                entry = ConditionEntry(embed(source))
+                self.nbytes += entry.nbytes
+            item = (source, entry)
+            self.entries[key] = item
+        self.entries.move_to_end(key)
+        return item[1]
+
+    def get_shared(self, name, source, embed):
+        key = (name, tuple(source.shape), source.dtype, source.device)
+        entry = self.shared.get(key, None)
+        if entry is not None and entry.embedded.device != source.device:
+            entry.to(source.device)
+        if entry is None:
+            entry = ConditionEntry(embed(source), shared=True)
+            self.shared[key] = entry
+            self.shared_nbytes += entry.nbytes
+            for other in list(self.shared):
+                if self.shared_nbytes <= self.shared_max_bytes:
+                    break
+                if other != key:
+                    self.shared_nbytes -= self.shared.pop(other).nbytes
+        self.shared.move_to_end(key)
+        return entry
+
+    def batch(self, sources, embed, shared_name=None):
+        entries = [self.get(source, embed, shared_name) for source in sources]
+        self.evict(keep=entries)
+        return CachedCondition(self, entries)
+
+    def store(self, entry, attn, kv):
+        nbytes = sum(t.numel() * t.element_size() for t in kv)
+        if entry.shared:
+            if self.shared_nbytes + nbytes > self.shared_max_bytes:
+                return
+            self.shared_nbytes += nbytes
+        else:
+            if self.nbytes + nbytes > self.max_bytes:
+                return
+            self.nbytes += nbytes
+        entry.kv[attn] = kv
+        entry.nbytes += nbytes
+
+    def evict(self, keep=()):
+        keep = [id(entry) for entry in keep]
+        for key in list(self.entries):
+            if self.nbytes <= self.max_bytes:
+                break
+            entry = self.entries[key][1]
+            if id(entry) not in keep:
+                del self.entries[key]
+                if not entry.shared:
+                    self.nbytes -= entry.nbytes
+
+    def clear(self, shared=False):
+        self.entries.clear()
+        self.nbytes = 0
+        if shared:
+            self.shared.clear()
+            self.shared_nbytes = 0
+
+    def offload(self):
+        self.clear()
+        for entry in self.shared.values():
+            entry.to('cpu')
+
+
+class StepCacheState:
+
+    def __init__(self):
+        self.metric = None
+        self.residual = None
+        self.accumulated = 0.
+        # one character per forward, C computed or S skipped
+        self.pattern = []
+
+
+class StepCache:
+    r"""
+    TeaCache-style reuse of the block stack across denoising steps. For each guidance
+    branch (e.g. "window0:tia") it accumulates the relative L1 change of a metric, the
+    timestep modulation e0 or the input of the first block, since the branch was last
+    computed. While the sum stays below threshold the cached residual (output minus input
+    of the blocks) is added instead of running them. A batch is skipped only if all of
+    its branches can be, and the first warmup_steps and last final_steps always run.
+    """
+
+    def __init__(self, threshold=0.05, metric='e0', warmup_steps=1, final_steps=1):
+        assert metric in ('e0', 'input')
+        self.threshold = threshold
+        self.metric = metric
+        self.warmup_steps = warmup_steps
+        self.final_steps = final_steps
+        self.states = {}
+        self.step = 0
+        self.num_steps = None
+
+    def set_step(self, step, num_steps):
+        self.step = step
+        self.num_steps = num_steps
+
+    @property
+    def active(self):
+        if self.step < self.warmup_steps:
+            return False
+        return self.num_steps is None or self.step < self.num_steps - self.final_steps
+
+    def can_skip(self, key, metric):
+        state = self.states.setdefault(key, StepCacheState())
+        previous, state.metric = state.metric, metric
+        if previous is None or state.residual is None or previous.shape != metric.shape:
+            return False
+        change = (metric - previous).abs().mean() / previous.abs().mean().clamp_min(1e-8)
+        state.accumulated += change.item()
+        return self.active and state.accumulated < self.threshold
+
+    def run(self, keys, metric, x, blocks):
+        skip = [self.can_skip(key, metric[i]) for i, key in enumerate(keys)]
+        if all(skip):
+            for key in keys:
+                self.states[key].pattern.append('S')
+            return x + torch.cat([self.states[key].residual for key in keys])
+
+        out = blocks(x)
+        for i, key in enumerate(keys):
+            state = self.states[key]
+            state.residual = out[i:i + 1] - x[i:i + 1]
+            state.accumulated = 0.
+            state.pattern.append('C')
+        return out
+
+    def report(self):
+        forwards = sum(len(state.pattern) for state in self.states.values())
+        skipped = sum(state.pattern.count('S') for state in self.states.values())
+        lines = [f'Step cache ({self.metric}, threshold {self.threshold}): '
+                 f'skipped {skipped}/{forwards} branch forwards.']
+        for key, state in self.states.items():
+            lines.append(f'  {key}: {state.pattern.count("S")}/{len(state.pattern)} {"".join(state.pattern)}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.states.clear()
+        self.step = 0
+        self.num_steps = None
+
+
 class WanRMSNorm(nn.Module):
 
     def __init__(self, dim, eps=1e-5):
@@ -100,6 +389,9 @@ class WanLayerNorm(nn.LayerNorm):
 
 class WanSelfAttention(nn.Module):
 
+    # attention backend of this call site, see WanModel.set_attention_backends
+    attention_backend = 'auto'
+
     def __init__(self,
                  dim,
                  num_heads,
@@ -123,13 +415,19 @@ class WanSelfAttention(nn.Module):
         self.norm_q = WanRMSNorm(dim, eps=eps) if qk_norm else nn.Identity()
         self.norm_k = WanRMSNorm(dim, eps=eps) if qk_norm else nn.Identity()
 
-    def forward(self, x, seq_lens, grid_sizes, freqs):
+    def context_kv(self, context):
+        if isinstance(context, CachedCondition):
+            return context.kv(self)
+        return self.norm_k(self.k(context)), self.v(context)
+
+    def forward(self, x, seq_lens, grid_sizes, freqs, geometry=None):
         r"""
         Args:
             x(Tensor): Shape [B, L, num_heads, C / num_heads], torch.Size([1, 9360, 5120])
             seq_lens(Tensor): Shape [B], tensor([9360])
             grid_sizes(Tensor): Shape [B, 3], the second dimension contains (F, H, W), tensor([[ 6, 30, 52]])
             freqs(Tensor): Rope freqs, shape [1024, C / num_heads / 2]
+            geometry(GeometryPlan): Precomputed RoPE tables and lengths, replaces the three above
         """
         b, s, n, d = *x.shape[:2], self.num_heads, self.head_dim
 
@@ -142,12 +440,24 @@ class WanSelfAttention(nn.Module):
 
         q, k, v = qkv_fn(x)
 
-        x = flash_attention(
+        if geometry is not None:
+            x = dispatch_attention(
+                q=geometry.rope(q),
+                k=geometry.rope(k),
+                v=v,
+                k_lens=geometry.k_lens,
+                window_size=self.window_size,
+                cu_seqlens_k=geometry.cu_seqlens_k,
+                backend=self.attention_backend)
+            return self.o(x.flatten(2))
+
+        x = dispatch_attention(
             q=rope_apply(q, grid_sizes, freqs),
             k=rope_apply(k, grid_sizes, freqs),
             v=v,
             k_lens=seq_lens,
-            window_size=self.window_size)
+            window_size=self.window_size,
+            backend=self.attention_backend)
 
         # output
         x = x.flatten(2)
@@ -157,6 +467,8 @@ class WanSelfAttention(nn.Module):
 
 class WanSelfAttentionSepKVDim(nn.Module):
 
+    attention_backend = 'auto'
+
     def __init__(self,
                  kv_dim,
                  dim,
@@ -181,6 +493,11 @@ class WanSelfAttentionSepKVDim(nn.Module):
         self.norm_q = WanRMSNorm(dim, eps=eps) if qk_norm else nn.Identity()
         self.norm_k = WanRMSNorm(dim, eps=eps) if qk_norm else nn.Identity()
 
+    def context_kv(self, context):
+        if isinstance(context, CachedCondition):
+            return context.kv(self)
+        return self.norm_k(self.k(context)), self.v(context)
+
     def forward(self, x, seq_lens, grid_sizes, freqs):
         r"""
         Args:
@@ -200,12 +517,13 @@ class WanSelfAttentionSepKVDim(nn.Module):
 
         q, k, v = qkv_fn(x)
 
-        x = flash_attention(
+        x = dispatch_attention(
             q=rope_apply(q, grid_sizes, freqs),
             k=rope_apply(k, grid_sizes, freqs),
             v=v,
             k_lens=seq_lens,
-            window_size=self.window_size)
+            window_size=self.window_size,
+            backend=self.attention_backend)
 
         # output
         x = x.flatten(2)
@@ -227,11 +545,12 @@ class WanT2VCrossAttention(WanSelfAttention):
 
         # compute query, key, value
         q = self.norm_q(self.q(x)).view(b, -1, n, d)
-        k = self.norm_k(self.k(context)).view(b, -1, n, d)
-        v = self.v(context).view(b, -1, n, d)
+        k, v = self.context_kv(context)
+        k = k.view(b, -1, n, d)
+        v = v.view(b, -1, n, d)
 
         # compute attention
-        x = flash_attention(q, k, v, k_lens=context_lens)
+        x = dispatch_attention(q, k, v, k_lens=context_lens, backend=self.attention_backend)
 
         # output
         x = x.flatten(2)
@@ -254,8 +573,9 @@ class WanT2VCrossAttentionGather(WanSelfAttentionSepKVDim):
         b, n, d = x.size(0), self.num_heads, self.head_dim
 
         q = self.norm_q(self.q(x)).view(b, -1, n, d)
-        k = self.norm_k(self.k(context)).view(b, -1, n, d)
-        v = self.v(context).view(b, -1, n, d)
+        k, v = self.context_kv(context)
+        k = k.view(b, -1, n, d)
+        v = v.view(b, -1, n, d)
 
         # Handle video spatial structure
         hlen_wlen = int(grid_sizes[0][1] * grid_sizes[0][2])
@@ -266,7 +586,7 @@ class WanT2VCrossAttentionGather(WanSelfAttentionSepKVDim):
         v = v.reshape(-1, 16, n, d)
 
         # Cross-attention
-        x = flash_attention(q, k, v, k_lens=None)  # No masking for audio
+        x = dispatch_attention(q, k, v, k_lens=None, backend=self.attention_backend)  # No masking for audio
         
         x = x.view(b, -1, n, d).flatten(2)
         x = self.o(x)
@@ -309,9 +629,10 @@ class WanI2VCrossAttention(WanSelfAttention):
 
         # compute query, key, value
         q = self.norm_q(self.q(x)).view(b, -1, n, d)
-        k = self.norm_k(self.k(context)).view(b, -1, n, d)
-        v = self.v(context).view(b, -1, n, d)
-        x = flash_attention(q, k, v, k_lens=context_lens)
+        k, v = self.context_kv(context)
+        k = k.view(b, -1, n, d)
+        v = v.view(b, -1, n, d)
+        x = dispatch_attention(q, k, v, k_lens=context_lens, backend=self.attention_backend)
         
         # output
         x = x.flatten(2)
@@ -326,6 +647,10 @@ WAN_CROSSATTENTION_CLASSES = {
 
 class WanAttentionBlock(nn.Module):
 
+    # sequence tiling of the FFN chain, see WanModel.set_ffn_chunking
+    ffn_chunk_size = None
+    ffn_chunk_mb = None
+
     def __init__(self,
                  cross_attn_type,
                  dim,
@@ -381,6 +706,7 @@ class WanAttentionBlock(nn.Module):
         audio=None, # None
         audio_seq_len=None,
         ref_num_list=None,
+        geometry=None,
     ):
         r"""
         Args:
@@ -391,6 +717,7 @@ class WanAttentionBlock(nn.Module):
             grid_sizes(Tensor): Shape [B, 3], the second dimension contains (F, H, W)
             freqs(Tensor): Rope freqs, shape [1024, C / num_heads / 2]
             ref_num_list: 配合seq_lens可以查到reference image在倒数第几个
+            geometry(GeometryPlan): Precomputed RoPE tables and lengths for self-attention
         """
         assert e.dtype == torch.float32
         with amp.autocast("cuda", dtype=torch.float32):
@@ -400,7 +727,7 @@ class WanAttentionBlock(nn.Module):
         # self-attention
         y = self.self_attn(
             self.norm1(x).float() * (1 + e[1]) + e[0], seq_lens, grid_sizes,
-            freqs)
+            freqs, geometry=geometry)
         with amp.autocast("cuda", dtype=torch.float32):
             x = x + y * e[2]
 
@@ -411,15 +738,46 @@ class WanAttentionBlock(nn.Module):
             if self.use_audio:
                 x = self.audio_cross_attn_wrapper(x, audio, seq_lens, grid_sizes, freqs, audio_seq_len)
 
+            return self.ffn_residual(x, e)
+
+        x = cross_attn_ffn(x, context, context_lens, e)
+
+        return x
+
+    def ffn_residual(self, x, e):
+        r"""
+        x + ffn(norm2(x) * (1 + e[4]) + e[3]) * e[5]. With chunking enabled the chain runs
+        in sequence tiles written in place into x, so neither the [L, ffn_dim] intermediate
+        nor a float32 copy of the whole residual stream is materialized.
+        """
+        tile = self.ffn_tile_size(x)
+        if tile is None or tile >= x.size(1):
             y = self.ffn(self.norm2(x).float() * (1 + e[4]) + e[3])
             with amp.autocast("cuda", dtype=torch.float32):
                 x = x + y * e[5]
             return x
 
-        x = cross_attn_ffn(x, context, context_lens, e)
-
+        # the residual stream is float32 after the first gated residual
+        if x.dtype != torch.float32:
+            x = x.float()
+        for start in range(0, x.size(1), tile):
+            x_tile = x[:, start:start + tile]
+            y = self.ffn(self.norm2(x_tile).float() * (1 + e[4]) + e[3])
+            with amp.autocast("cuda", dtype=torch.float32):
+                x_tile.add_(y * e[5])
+            del y
         return x
 
+    def ffn_tile_size(self, x):
+        if self.ffn_chunk_size:
+            return self.ffn_chunk_size
+        if self.ffn_chunk_mb:
+            # float32 norm, modulation, output and residual terms plus the two
+            # [ffn_dim] activations around the GELU, per token of the batch
+            token_bytes = x.size(0) * 4 * (4 * self.dim + 2 * self.ffn_dim)
+            return max(256, int(self.ffn_chunk_mb * 2**20 // token_bytes))
+        return None
+
 
 class Head(nn.Module):
 
@@ -590,6 +948,12 @@ class WanModel(nn.Module):
         ],
                                dim=1)
 
+        # step-invariant conditioning, set by the caller for the duration of a request
+        self.condition_cache = None
+        # optional reuse of the block stack across steps, see StepCache
+        self.step_cache = None
+        self.geometry_plans = OrderedDict()
+
         # initialize weights
         self.init_weights()
 
@@ -611,6 +975,7 @@ class WanModel(nn.Module):
         seq_len,
         audio=None,
         y=None,
+        step_cache_keys=None,
     ):
         r"""
         Forward pass through the diffusion model
@@ -628,6 +993,8 @@ class WanModel(nn.Module):
                 CLIP image features for image-to-video mode
             y (List[Tensor], *optional*):
                 Conditional video inputs for image-to-video mode, same shape as x
+            step_cache_keys (List[str], *optional*):
+                Guidance branch of each sample, enables the step cache when it is set
 
         Returns:
             List[Tensor]:
@@ -651,8 +1018,9 @@ class WanModel(nn.Module):
             [torch.tensor(u.shape[2:], dtype=torch.long) for u in x])
         
         x = [u.flatten(2).transpose(1, 2) for u in x]
-        seq_lens = torch.tensor([u.size(1) for u in x], dtype=torch.long, device=device)
-        assert seq_lens.max() <= seq_len
+        assert max(u.size(1) for u in x) <= seq_len
+        geometry = self.geometry_plan(grid_sizes, seq_len, device)
+        seq_lens = geometry.seq_lens
         
         x = torch.cat([
             torch.cat([u, u.new_zeros(1, seq_len - u.size(1), u.size(2))],
@@ -668,18 +1036,17 @@ class WanModel(nn.Module):
 
         # context
         context_lens = None
-        context = self.text_embedding(
-            torch.stack([
-                torch.cat(
-                    [u, u.new_zeros(self.text_len - u.size(0), u.size(1))])
-                for u in context
-            ]))
-
-        if self.insert_audio:
-            audio = [self.audio_proj(au.unsqueeze(0)).permute(0, 3, 1, 2) for au in audio]
-            
-            audio_seq_len = torch.tensor(max([au.shape[2] for au in audio]) * audio[0].shape[3], device=get_device())
-            audio = [au.flatten(2).transpose(1, 2) for au in audio] # [1, t*32, 1536]
+        if self.condition_cache is not None:
+            context = self.condition_cache.batch(context, lambda u: self.embed_text([u]))
+        else:
+            context = self.embed_text(context)
+
+        if self.insert_audio and self.condition_cache is not None:
+            audio = self.condition_cache.batch(audio, self.embed_audio, shared_name="audio")
+            audio_seq_len = torch.tensor(audio.length, device=get_device())
+        elif self.insert_audio:
+            audio = [self.embed_audio(au) for au in audio] # [1, t*16, 1536]
+            audio_seq_len = torch.tensor(max([au.size(1) for au in audio]), device=get_device())
             audio = torch.cat([
                 torch.cat([au, au.new_zeros(1, audio_seq_len - au.size(1), au.size(2))],
                         dim=1) for au in audio
@@ -697,10 +1064,19 @@ class WanModel(nn.Module):
             context=context,
             context_lens=context_lens,
             audio=audio,
-            audio_seq_len=audio_seq_len)
+            audio_seq_len=audio_seq_len,
+            geometry=geometry)
 
-        for block in self.blocks:
-            x = block(x, **kwargs)
+        def run_blocks(x):
+            for block in self.blocks:
+                x = block(x, **kwargs)
+            return x
+
+        if self.step_cache is not None and step_cache_keys is not None:
+            metric = e0 if self.step_cache.metric == 'e0' else x
+            x = self.step_cache.run(step_cache_keys, metric, x, run_blocks)
+        else:
+            x = run_blocks(x)
 
         # head
         x = self.head(x, e)
@@ -709,6 +1085,60 @@ class WanModel(nn.Module):
         x = self.unpatchify(x, grid_sizes)
         return [u.float() for u in x]
 
+    def set_attention_backends(self, self_attn='auto', cross_attn='auto', audio_attn='auto'):
+        r"""
+        Select the attention backend per call site: 'auto' or a name registered in
+        attention.ATTENTION_BACKENDS (fa3, fa2, sdpa, math).
+        """
+        for name in (self_attn, cross_attn, audio_attn):
+            check_attention_backend(name)
+        for block in self.blocks:
+            block.self_attn.attention_backend = self_attn
+            block.cross_attn.attention_backend = cross_attn
+            if block.use_audio:
+                block.audio_cross_attn_wrapper.audio_cross_attn.attention_backend = audio_attn
+
+    def set_ffn_chunking(self, chunk_size=None, memory_mb=None):
+        r"""
+        Run the FFN chain of every block in sequence tiles of chunk_size tokens, or of the
+        largest size fitting in memory_mb. Both None disables chunking.
+        """
+        for block in self.blocks:
+            block.ffn_chunk_size = chunk_size
+            block.ffn_chunk_mb = memory_mb
+
+    def release_caches(self):
+        r"""
+        Drop the device copies of cached conditioning and geometry plans, called when the
+        model is evicted.
+        """
+        if self.condition_cache is not None:
+            self.condition_cache.offload()
+        self.geometry_plans.clear()
+
+    def geometry_plan(self, grid_sizes, seq_len, device):
+        key = (tuple(map(tuple, grid_sizes.tolist())), seq_len, device)
+        plan = self.geometry_plans.get(key, None)
+        if plan is None:
+            plan = GeometryPlan(grid_sizes, seq_len, self.freqs, device)
+            self.geometry_plans[key] = plan
+            while len(self.geometry_plans) > 8:
+                self.geometry_plans.popitem(last=False)
+        self.geometry_plans.move_to_end(key)
+        return plan
+
+    def embed_text(self, context):
+        return self.text_embedding(
+            torch.stack([
+                torch.cat(
+                    [u, u.new_zeros(self.text_len - u.size(0), u.size(1))])
+                for u in context
+            ]))
+
+    def embed_audio(self, audio):
+        audio = self.audio_proj(audio.unsqueeze(0)).permute(0, 3, 1, 2)
+        return audio.flatten(2).transpose(1, 2)
+
     def unpatchify(self, x, grid_sizes):
         r"""
         Reconstruct video tensors from patch embeddings.
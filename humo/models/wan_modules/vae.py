@@ -1,24 +1,85 @@
 # Copyright 2024-2025 The Alibaba Wan Team Authors. All rights reserved.
 import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import torch
 import torch.amp as amp
+import torch.distributed as dist
+import torch.multiprocessing as mp
 import torch.nn as nn
 import torch.nn.functional as F
 from einops import rearrange
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 __all__ = [
     'WanVAE',
 ]
 
 CACHE_T = 2
 
+# Tensors of [dim, 4 frames, 8x8 pixels] per latent pixel alive at the peak of the full-resolution
+# decoder stage (activations, padded conv inputs and causal caches), used to size VAE tiles
+# and decode chunks.
+VAE_TILE_TENSORS = 12
+
+# Share of the free device memory (or available RAM) used when no budget is configured.
+VAE_MEMORY_FRACTION = 0.8
+
+
+class CausalCache:
+    """
+    Staging buffer of one causal conv, laid out [history | chunk] along time. stage() copies
+    the chunk in once and returns a view the conv reads in place, advance() carries the last
+    history frames over to the front. The history starts as zeros, which is the temporal
+    padding of the first chunk. The buffer is only reallocated when the chunk shape changes,
+    and is laid out in memory_format, the layout of the conv reading it.
+    """
+
+    def __init__(self, history, memory_format=torch.contiguous_format):
+        self.history = history
+        self.memory_format = memory_format
+        self.buffer = None
+        self.frames = 0
+
+    def stage(self, x):
+        b, c, t, h, w = x.shape
+        buffer = self.buffer
+        shape = (b, c, self.history + t, h, w)
+        if buffer is None or buffer.shape != shape or buffer.dtype != x.dtype or buffer.device != x.device:
+            self.buffer = torch.empty(
+                shape, dtype=x.dtype, device=x.device, memory_format=self.memory_format).zero_()
+            if buffer is not None and buffer.shape[3:] == (h, w) and buffer.shape[:2] == (b, c):
+                self.buffer[:, :, :self.history] = buffer[:, :, :self.history]
+            buffer = self.buffer
+        buffer[:, :, self.history:].copy_(x)
+        self.frames = t
+        return buffer
+
+    def advance(self):
+        t, history = self.frames, self.history
+        src = self.buffer[:, :, t:t + history]
+        if t < history:
+            # source and destination overlap
+            src = src.clone()
+        self.buffer[:, :, :history].copy_(src)
+
 
 class CausalConv3d(nn.Conv3d):
     """
     Causal 3d convolusion.
     """
 
+    # Stream chunks through a CausalCache staging buffer, False restores the clone/cat caches.
+    staging = True
+    # Layout of the staging buffers, channels_last_3d with WanVAE_.fast_path.
+    memory_format = torch.contiguous_format
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._padding = (self.padding[2], self.padding[2], self.padding[1],
@@ -35,6 +96,42 @@ class CausalConv3d(nn.Conv3d):
 
         return super().forward(x)
 
+    def forward_staged(self, x):
+        """
+        Conv of a staged [history | chunk] buffer. The temporal padding is the history, the
+        spatial zero padding is done by the conv instead of F.pad.
+        """
+        return F.conv3d(x, self.weight, self.bias, self.stride,
+                        (0, self._padding[2], self._padding[0]), self.dilation,
+                        self.groups)
+
+    def stream(self, x, feat_cache, feat_idx):
+        """
+        Run the next chunk x of a causal stream, feat_cache[feat_idx[0]] holding the previous
+        frames of this layer.
+        """
+        idx = feat_idx[0]
+        feat_idx[0] += 1
+        if not self.staging:
+            cache_x = x[:, :, -CACHE_T:, :, :].clone()
+            if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
+                # cache last frame of last two chunk
+                cache_x = torch.cat([
+                    feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
+                        cache_x.device), cache_x
+                ],
+                                    dim=2)
+            x = self(x, feat_cache[idx])
+            feat_cache[idx] = cache_x
+            return x
+
+        if feat_cache[idx] is None:
+            feat_cache[idx] = CausalCache(self._padding[4], self.memory_format)
+        cache = feat_cache[idx]
+        x = self.forward_staged(cache.stage(x))
+        cache.advance()
+        return x
+
 
 class RMS_norm(nn.Module):
 
@@ -47,12 +144,30 @@ class RMS_norm(nn.Module):
         self.scale = dim**0.5
         self.gamma = nn.Parameter(torch.ones(shape))
         self.bias = nn.Parameter(torch.zeros(shape)) if bias else 0.
+        # Apply the following SiLU as well, set by WanVAE_.fast_path.
+        self.silu = False
 
     def forward(self, x):
+        if self.silu:
+            return self.forward_silu(x)
+        return self.forward_norm(x)
+
+    def forward_norm(self, x):
         return F.normalize(
             x, dim=(1 if self.channel_first else
                     -1)) * self.scale * self.gamma + self.bias
 
+    def forward_silu(self, x):
+        """
+        silu(self(x)) with the scale folded into gamma and the affine and activation applied
+        in place, one activation-sized tensor instead of five.
+        """
+        x = F.normalize(x, dim=(1 if self.channel_first else -1))
+        x = x.mul_(self.gamma * self.scale)
+        if isinstance(self.bias, torch.Tensor):
+            x = x.add_(self.bias)
+        return F.silu(x, inplace=True)
+
 
 class Upsample(nn.Upsample):
 
@@ -106,6 +221,16 @@ class Resample(nn.Module):
                 if feat_cache[idx] is None:
                     feat_cache[idx] = 'Rep'
                     feat_idx[0] += 1
+                elif self.time_conv.staging:
+                    # The first chunk is not upsampled in time, the time conv stream
+                    # starts at the second one with zero history.
+                    if isinstance(feat_cache[idx], str):
+                        feat_cache[idx] = None
+                    x = self.time_conv.stream(x, feat_cache, feat_idx)
+                    x = x.reshape(b, 2, c, t, h, w)
+                    x = torch.stack((x[:, 0, :, :, :, :], x[:, 1, :, :, :, :]),
+                                    3)
+                    x = x.reshape(b, c, t * 2, h, w)
                 else:
 
                     cache_x = x[:, :, -CACHE_T:, :, :].clone()
@@ -141,7 +266,19 @@ class Resample(nn.Module):
         x = rearrange(x, '(b t) c h w -> b c t h w', t=t)
 
         if self.mode == 'downsample3d':
-            if feat_cache is not None:
+            if feat_cache is not None and self.time_conv.staging:
+                # Strided time conv over [last frame of the previous chunk | chunk], the
+                # first chunk passes through unchanged.
+                idx = feat_idx[0]
+                feat_idx[0] += 1
+                first = feat_cache[idx] is None
+                if first:
+                    feat_cache[idx] = CausalCache(1, self.time_conv.memory_format)
+                staged = feat_cache[idx].stage(x)
+                if not first:
+                    x = self.time_conv.forward_staged(staged)
+                feat_cache[idx].advance()
+            elif feat_cache is not None:
                 idx = feat_idx[0]
                 if feat_cache[idx] is None:
                     feat_cache[idx] = x.clone()
@@ -203,18 +340,7 @@ class ResidualBlock(nn.Module):
         h = self.shortcut(x)
         for layer in self.residual:
             if isinstance(layer, CausalConv3d) and feat_cache is not None:
-                idx = feat_idx[0]
-                cache_x = x[:, :, -CACHE_T:, :, :].clone()
-                if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
-                    # cache last frame of last two chunk
-                    cache_x = torch.cat([
-                        feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
-                            cache_x.device), cache_x
-                    ],
-                                        dim=2)
-                x = layer(x, feat_cache[idx])
-                feat_cache[idx] = cache_x
-                feat_idx[0] += 1
+                x = layer.stream(x, feat_cache, feat_idx)
             else:
                 x = layer(x)
         return x + h
@@ -317,18 +443,7 @@ class Encoder3d(nn.Module):
 
     def forward(self, x, feat_cache=None, feat_idx=[0]):
         if feat_cache is not None:
-            idx = feat_idx[0]
-            cache_x = x[:, :, -CACHE_T:, :, :].clone()
-            if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
-                # cache last frame of last two chunk
-                cache_x = torch.cat([
-                    feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
-                        cache_x.device), cache_x
-                ],
-                                    dim=2)
-            x = self.conv1(x, feat_cache[idx])
-            feat_cache[idx] = cache_x
-            feat_idx[0] += 1
+            x = self.conv1.stream(x, feat_cache, feat_idx)
         else:
             x = self.conv1(x)
 
@@ -349,18 +464,7 @@ class Encoder3d(nn.Module):
         ## head
         for layer in self.head:
             if isinstance(layer, CausalConv3d) and feat_cache is not None:
-                idx = feat_idx[0]
-                cache_x = x[:, :, -CACHE_T:, :, :].clone()
-                if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
-                    # cache last frame of last two chunk
-                    cache_x = torch.cat([
-                        feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
-                            cache_x.device), cache_x
-                    ],
-                                        dim=2)
-                x = layer(x, feat_cache[idx])
-                feat_cache[idx] = cache_x
-                feat_idx[0] += 1
+                x = layer.stream(x, feat_cache, feat_idx)
             else:
                 x = layer(x)
         return x
@@ -423,18 +527,7 @@ class Decoder3d(nn.Module):
     def forward(self, x, feat_cache=None, feat_idx=[0]):
         ## conv1
         if feat_cache is not None:
-            idx = feat_idx[0]
-            cache_x = x[:, :, -CACHE_T:, :, :].clone()
-            if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
-                # cache last frame of last two chunk
-                cache_x = torch.cat([
-                    feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
-                        cache_x.device), cache_x
-                ],
-                                    dim=2)
-            x = self.conv1(x, feat_cache[idx])
-            feat_cache[idx] = cache_x
-            feat_idx[0] += 1
+            x = self.conv1.stream(x, feat_cache, feat_idx)
         else:
             x = self.conv1(x)
 
@@ -455,18 +548,7 @@ class Decoder3d(nn.Module):
         ## head
         for layer in self.head:
             if isinstance(layer, CausalConv3d) and feat_cache is not None:
-                idx = feat_idx[0]
-                cache_x = x[:, :, -CACHE_T:, :, :].clone()
-                if cache_x.shape[2] < 2 and feat_cache[idx] is not None:
-                    # cache last frame of last two chunk
-                    cache_x = torch.cat([
-                        feat_cache[idx][:, :, -1, :, :].unsqueeze(2).to(
-                            cache_x.device), cache_x
-                    ],
-                                        dim=2)
-                x = layer(x, feat_cache[idx])
-                feat_cache[idx] = cache_x
-                feat_idx[0] += 1
+                x = layer.stream(x, feat_cache, feat_idx)
             else:
                 x = layer(x)
         return x
@@ -480,6 +562,44 @@ def count_conv3d(model):
     return count
 
 
+def tile_spans(size, tile, overlap):
+    """
+    [start, end) of overlapping tiles covering size, the last one aligned to the end.
+    """
+    if tile >= size:
+        return [(0, size)]
+    starts = list(range(0, size - tile, tile - overlap)) + [size - tile]
+    return [(start, start + tile) for start in starts]
+
+
+def feather(length, ramp, at_start, at_end):
+    """
+    Blending weights along one tile axis, linear ramps over the overlap on interior edges.
+    """
+    weight = torch.ones(length)
+    if ramp > 0:
+        edge = (torch.arange(ramp) + 0.5) / ramp
+        if not at_start:
+            weight[:ramp] = edge
+        if not at_end:
+            weight[-ramp:] = torch.minimum(weight[-ramp:], edge.flip(0))
+    return weight
+
+
+def spatial_tiles(height, width, tile, overlap, ratio=1):
+    """
+    Overlapping tiles of a height x width latent plane as ((y0, y1, x0, x1), mask), with the
+    feathering mask [h, w] in latent pixels scaled by ratio.
+    """
+    tiles = []
+    for y0, y1 in tile_spans(height, tile, overlap):
+        for x0, x1 in tile_spans(width, tile, overlap):
+            wy = feather((y1 - y0) * ratio, overlap * ratio, y0 == 0, y1 == height)
+            wx = feather((x1 - x0) * ratio, overlap * ratio, x0 == 0, x1 == width)
+            tiles.append(((y0, y1, x0, x1), wy[:, None] * wx[None, :]))
+    return tiles
+
+
 class WanVAE_(nn.Module):
 
     def __init__(self,
@@ -498,6 +618,8 @@ class WanVAE_(nn.Module):
         self.attn_scales = attn_scales
         self.temperal_downsample = temperal_downsample
         self.temperal_upsample = temperal_downsample[::-1]
+        self.spatial_ratio = 2**(len(dim_mult) - 1)
+        self.memory_format = torch.contiguous_format
 
         # modules
         self.encoder = Encoder3d(dim, z_dim * 2, dim_mult, num_res_blocks,
@@ -513,8 +635,45 @@ class WanVAE_(nn.Module):
         x_recon = self.decode(z)
         return x_recon, mu, log_var
 
+    def fast_path(self, dtype=None, channels_last=True, fused=True):
+        """
+        Optimized execution: weights in dtype, the causal convs and their staging buffers in
+        channels_last_3d, and every RMS_norm -> SiLU pair fused into the norm. Keeps the
+        state_dict keys, the replaced SiLU modules have no parameters.
+        """
+        if dtype is not None:
+            self.to(dtype)
+        if channels_last:
+            self.memory_format = torch.channels_last_3d
+            for m in self.modules():
+                if isinstance(m, CausalConv3d):
+                    m.to(memory_format=torch.channels_last_3d)
+                    m.memory_format = torch.channels_last_3d
+        if fused:
+            for m in self.modules():
+                if isinstance(m, nn.Sequential):
+                    for i in range(len(m) - 1):
+                        if isinstance(m[i], RMS_norm) and isinstance(m[i + 1], nn.SiLU):
+                            m[i].silu = True
+                            m[i + 1] = nn.Identity()
+        return self
+
+    def compile_blocks(self, **kwargs):
+        """
+        Regional torch.compile of the RMS_norms in the residual blocks, heads and attention:
+        both forward_norm and the fused norm+SiLU forward_silu are compiled, the eager
+        forward picks one depending on fast_path. The causal convs stay eager, their
+        staging buffers are reallocated and written in place between calls.
+        """
+        for m in self.modules():
+            if isinstance(m, RMS_norm):
+                m.forward_norm = torch.compile(m.forward_norm, **kwargs)
+                m.forward_silu = torch.compile(m.forward_silu, **kwargs)
+        return self
+
     def encode(self, x, scale):
         self.clear_cache()
+        x = x.to(self.encoder.conv1.weight.dtype, memory_format=self.memory_format)
         ## cache
         t = x.shape[2]
         iter_ = 1 + (t - 1) // 4
@@ -541,31 +700,101 @@ class WanVAE_(nn.Module):
         self.clear_cache()
         return mu
 
-    def decode(self, z, scale):
-        self.clear_cache()
+    def decode(self, z, scale, chunk=1):
+        # The first latent frame decodes to 1 frame, every following one to 4.
+        num_frames = 4 * (z.shape[2] - 1) + 1
+        out = None
+        t = 0
+        for out_ in self.decode_iter(z, scale, chunk):
+            if out is None:
+                out = out_.new_empty(*out_.shape[:2], num_frames, *out_.shape[3:])
+            out[:, :, t:t + out_.shape[2]] = out_
+            t += out_.shape[2]
+        return out
+
+    def decode_iter(self, z, scale, chunk=1):
+        """
+        Decode z: [b,c,t,h,w] chunk latent frames at a time, yielding [b,3,t',h',w'] chunks.
+        The first latent frame is always decoded alone, since the temporal upsampling only
+        starts after it; every later chunk gives the same frames as decoding them one by one.
+        Every call keeps its own causal cache, so several decodes can be interleaved.
+        """
         # z: [b,c,t,h,w]
         if isinstance(scale[0], torch.Tensor):
             z = z / scale[1].view(1, self.z_dim, 1, 1, 1) + scale[0].view(
                 1, self.z_dim, 1, 1, 1)
         else:
             z = z / scale[1] + scale[0]
+        z = z.to(self.conv2.weight.dtype, memory_format=self.memory_format)
         iter_ = z.shape[2]
         x = self.conv2(z)
-        for i in range(iter_):
-            self._conv_idx = [0]
-            if i == 0:
-                out = self.decoder(
-                    x[:, :, i:i + 1, :, :],
-                    feat_cache=self._feat_map,
-                    feat_idx=self._conv_idx)
-            else:
-                out_ = self.decoder(
-                    x[:, :, i:i + 1, :, :],
-                    feat_cache=self._feat_map,
-                    feat_idx=self._conv_idx)
-                out = torch.cat([out, out_], 2)
-        self.clear_cache()
-        return out
+        feat_map = [None] * count_conv3d(self.decoder)
+        spans = [(0, 1)] + [(i, min(i + chunk, iter_)) for i in range(1, iter_, chunk)]
+        for start, end in spans:
+            yield self.decoder(
+                x[:, :, start:end, :, :], feat_cache=feat_map, feat_idx=[0])
+
+    def decode_tiled(self, z, scale, tile, overlap, chunk=1):
+        """
+        Decode z in overlapping spatial tiles of tile latent pixels. Each tile runs over the
+        whole clip with its own causal cache, so activations and caches scale with the tile
+        instead of the frame, and the overlaps are feathered together.
+        """
+        ratio = self.spatial_ratio
+        out = weight = None
+        for (y0, y1, x0, x1), mask in spatial_tiles(*z.shape[3:], tile, overlap, ratio):
+            tile_out = self.decode(z[:, :, :, y0:y1, x0:x1], scale, chunk)
+            if out is None:
+                out = tile_out.new_zeros(
+                    *tile_out.shape[:3], z.shape[3] * ratio, z.shape[4] * ratio, dtype=torch.float)
+                weight = out.new_zeros(out.shape[3:])
+            ys, xs = slice(y0 * ratio, y1 * ratio), slice(x0 * ratio, x1 * ratio)
+            mask = mask.to(out.device)
+            out[..., ys, xs] += tile_out * mask
+            weight[ys, xs] += mask
+            del tile_out
+        return out.div_(weight)
+
+    def decode_tiled_iter(self, z, scale, tile, overlap, chunk=1):
+        """
+        Streaming decode_tiled: all tiles advance one latent frame at a time, each with its own
+        causal cache, and every blended chunk is yielded as soon as it is complete. Activations
+        scale with the tile, the caches of all tiles stay alive together.
+        """
+        ratio = self.spatial_ratio
+        tiles = spatial_tiles(*z.shape[3:], tile, overlap, ratio)
+        streams = [
+            self.decode_iter(z[:, :, :, y0:y1, x0:x1], scale, chunk)
+            for (y0, y1, x0, x1), _ in tiles
+        ]
+        masks = [mask.to(z.device) for _, mask in tiles]
+        weight = z.new_zeros(z.shape[3] * ratio, z.shape[4] * ratio, dtype=torch.float)
+        for ((y0, y1, x0, x1), _), mask in zip(tiles, masks):
+            weight[y0 * ratio:y1 * ratio, x0 * ratio:x1 * ratio] += mask
+        for chunks in zip(*streams):
+            out = chunks[0].new_zeros(*chunks[0].shape[:3], *weight.shape, dtype=torch.float)
+            for ((y0, y1, x0, x1), _), mask, chunk in zip(tiles, masks, chunks):
+                out[..., y0 * ratio:y1 * ratio, x0 * ratio:x1 * ratio] += chunk * mask
+            yield out.div_(weight)
+
+    def encode_tiled(self, x, scale, tile, overlap):
+        """
+        Encode x in overlapping spatial tiles of tile latent pixels, each over the whole clip
+        with its own causal cache, feathering the tile latents like decode_tiled.
+        """
+        ratio = self.spatial_ratio
+        height, width = x.shape[3] // ratio, x.shape[4] // ratio
+        out = weight = None
+        for (y0, y1, x0, x1), mask in spatial_tiles(height, width, tile, overlap):
+            mu = self.encode(
+                x[:, :, :, y0 * ratio:y1 * ratio, x0 * ratio:x1 * ratio], scale)
+            if out is None:
+                out = mu.new_zeros(*mu.shape[:3], height, width, dtype=torch.float)
+                weight = out.new_zeros(height, width)
+            mask = mask.to(out.device)
+            out[..., y0:y1, x0:x1] += mu * mask
+            weight[y0:y1, x0:x1] += mask
+        return out.div_(weight)
 
     def reparameterize(self, mu, log_var):
         std = torch.exp(0.5 * log_var)
@@ -616,6 +845,54 @@ def _video_vae(pretrained_path=None, z_dim=None, device='cpu', **kwargs):
     return model
 
 
+def temporal_segments(frames, segments, halo):
+    """
+    Split frames latent frames into up to segments contiguous parts, as (warmup, start, end):
+    the part is [start, end) and its causal cache is rebuilt from [warmup, start). Every part
+    but the first warms up on at least one latent frame, otherwise its first latent frame
+    would decode as the start of a clip, to 1 frame instead of 4.
+    """
+    segments = max(1, min(segments, frames))
+    bounds = [round(i * frames / segments) for i in range(segments + 1)]
+    halo = max(halo, 1)
+    return [(max(start - halo, 0), start, end) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def decode_segment(model, z, scale, warmup, start, end, tile=None, overlap=0, chunk=1):
+    """
+    Decode latent frames [start, end) of z after warming the causal cache up on
+    [warmup, start), returning only the frames of [start, end).
+    """
+    if tile:
+        video = model.decode_tiled(z[:, :, warmup:end], scale, tile, overlap, chunk)
+    else:
+        video = model.decode(z[:, :, warmup:end], scale, chunk)
+    if start > warmup:
+        # The warm-up starts a new clip: its first latent frame decodes to 1 frame, the rest to 4.
+        video = video[:, :, 1 + 4 * (start - warmup - 1):]
+    return video
+
+
+# VAE of a decode worker process, see WanVAE.set_parallel_decode
+_segment_model = None
+
+
+def _init_segment_worker(z_dim, state_dict, threads, fast_path=None):
+    global _segment_model
+    torch.set_num_threads(threads)
+    _segment_model = _video_vae(z_dim=z_dim).eval().requires_grad_(False)
+    _segment_model.load_state_dict(state_dict, assign=True)
+    if fast_path is not None:
+        _segment_model.fast_path(**fast_path)
+
+
+@torch.no_grad()
+def _decode_segment_worker(z, scale, warmup, start, end, tile, overlap, chunk, dtype):
+    with amp.autocast("cuda", dtype=dtype):
+        return decode_segment(_segment_model, z, scale, warmup, start, end, tile, overlap,
+                              chunk).float()
+
+
 class WanVAE:
 
     def __init__(self,
@@ -638,29 +915,278 @@ class WanVAE:
         self.std = torch.tensor(std, dtype=dtype, device=device)
         self.scale = [self.mean, 1.0 / self.std]
 
+        # spatial tiling, see set_tiling
+        self.tiling = False
+        self.tile_size = None
+        self.tile_overlap = 0
+        self.tile_memory_mb = None
+        # temporal decode chunks, see set_decode_chunk
+        self.chunking = False
+        self.chunk_frames = None
+        self.chunk_memory_mb = None
+        # temporal-parallel decode, see set_parallel_decode
+        self.parallel = None
+        self.parallel_workers = 1
+        self.parallel_halo = 0
+        self.parallel_group = None
+        self.segment_pool = None
+        # optimized execution, see set_fast_path
+        self.fast_path = None
+
         # init model
         self.model = _video_vae(
             pretrained_path=vae_pth,
             z_dim=z_dim,
         ).eval().requires_grad_(False).to(device)
 
+    def cache_options(self):
+        """
+        Configured settings besides the checkpoint that change encoded latents, for cache
+        keys. Tiling is keyed on its configuration, not on the tile size derived from the
+        free memory, so the same request always maps to the same key.
+        """
+        fast_path = sorted(self.fast_path.items()) if self.fast_path else None
+        tiling = (self.tile_size, self.tile_overlap, self.tile_memory_mb) if self.tiling else None
+        return str(self.dtype), str(fast_path), str(tiling)
+
+    def default_options(self):
+        """
+        Whether the VAE runs with its default settings: float32, no fast path, no tiling.
+        """
+        return self.dtype == torch.float32 and not self.fast_path and not self.tiling
+
+    def set_tiling(self, enabled=True, tile_size=None, overlap=4, memory_mb=None):
+        """
+        Encode and decode in overlapping spatial tiles of tile_size latent pixels, or of the
+        largest size whose activations fit in memory_mb (default: the free CUDA memory).
+        overlap is in latent pixels and is feathered between neighbouring tiles.
+        """
+        self.tiling = enabled
+        self.tile_size = tile_size
+        self.tile_overlap = overlap
+        self.tile_memory_mb = memory_mb
+
+    def set_fast_path(self, dtype=None, channels_last=True, fused=True):
+        """
+        Run the VAE in its optimized mode (see WanVAE_.fast_path) with the weights, inputs and
+        autocast in dtype, default the autocast dtype.
+        """
+        self.fast_path = dict(dtype=dtype or self.dtype, channels_last=channels_last, fused=fused)
+        self.dtype = self.fast_path['dtype']
+        self.model.fast_path(**self.fast_path)
+        if self.segment_pool is not None:
+            # workers hold a snapshot of the previous weights
+            self.segment_pool.shutdown()
+            self.segment_pool = None
+
+    def compile(self, **kwargs):
+        """
+        Regional torch.compile of the VAE, see WanVAE_.compile_blocks. Parallel decode
+        workers run eager.
+        """
+        self.model.compile_blocks(**kwargs)
+
+    def set_decode_chunk(self, frames=None, memory_mb=None):
+        """
+        Decode frames latent frames per decoder call after the first one, or as many as fit
+        in memory_mb (default: the free device memory) when frames is None.
+        """
+        self.chunking = True
+        self.chunk_frames = frames
+        self.chunk_memory_mb = memory_mb
+
+    def memory_budget(self, memory_mb=None):
+        """
+        Bytes available for VAE activations: memory_mb if set, otherwise a share of the free
+        CUDA memory or of the available RAM. None if unknown.
+        """
+        if memory_mb:
+            return memory_mb * 2**20
+        device = next(self.model.parameters()).device
+        if device.type == 'cuda':
+            return int(torch.cuda.mem_get_info(device)[0] * VAE_MEMORY_FRACTION)
+        if psutil is not None:
+            # decode worker processes share the RAM
+            workers = self.parallel_workers if self.parallel == 'process' else 1
+            return int(psutil.virtual_memory().available * VAE_MEMORY_FRACTION / workers)
+        return None
+
+    def latent_pixel_bytes(self):
+        # Decoder peak per latent pixel of one latent frame (4 output frames).
+        return (VAE_TILE_TENSORS * self.model.dim * 4 * self.model.spatial_ratio**2 *
+                torch.finfo(self.dtype).bits // 8)
+
+    def tile_for(self, height, width):
+        """
+        Tile size in latent pixels for a height x width latent, None if the frame fits whole.
+        """
+        if not self.tiling:
+            return None
+        tile = self.tile_size
+        if not tile:
+            budget = self.memory_budget(self.tile_memory_mb)
+            if budget is None:
+                return None
+            tile = int(math.sqrt(budget / self.latent_pixel_bytes()))
+        if tile >= height and tile >= width:
+            return None
+        return max(tile, 2 * self.tile_overlap + 1)
+
+    def chunk_for(self, height, width):
+        """
+        Latent frames per decoder call for a height x width latent (or tile).
+        """
+        if not self.chunking:
+            return 1
+        if self.chunk_frames:
+            return self.chunk_frames
+        budget = self.memory_budget(self.chunk_memory_mb)
+        if budget is None:
+            return 1
+        return max(1, int(budget // (self.latent_pixel_bytes() * height * width)))
+
+    def set_parallel_decode(self, backend='process', workers=None, halo=4, group=None):
+        """
+        Decode temporal segments in parallel, each warming its causal cache up on halo latent
+        frames before it whose output is dropped. halo is at least 1, see temporal_segments.
+
+        backend 'process' runs workers CPU processes (default one per 8 cores, at least 2) and
+        is skipped while the VAE is on a GPU. backend 'distributed' gives one segment to every
+        rank of group (default WORLD, e.g. gloo on a render farm); all ranks must decode the
+        same latent and each gets the whole video.
+        """
+        if backend not in ('process', 'distributed'):
+            raise ValueError(f'Unknown parallel decode backend {backend}, choose from process, distributed.')
+        if backend == 'process':
+            workers = workers or max(2, (os.cpu_count() or 1) // 8)
+        if self.segment_pool is not None and (backend != 'process' or workers != self.parallel_workers):
+            self.segment_pool.shutdown()
+            self.segment_pool = None
+        self.parallel = backend
+        self.parallel_workers = workers or 1
+        self.parallel_halo = halo
+        self.parallel_group = group
+
+    def parallel_decode_for(self, frames):
+        if self.parallel is None or frames < 2:
+            return False
+        if self.parallel == 'distributed':
+            return dist.is_initialized() and dist.get_world_size(self.parallel_group) > 1
+        return self.parallel_workers > 1 and next(self.model.parameters()).device.type == 'cpu'
+
+    def segment_executor(self):
+        """
+        Process pool of decode workers, created on first use from a snapshot of the weights.
+        Workers are spawned rather than forked, since forking after OpenMP has run can hang.
+        """
+        if self.segment_pool is None:
+            state_dict = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
+            threads = max(1, torch.get_num_threads() // self.parallel_workers)
+            self.segment_pool = ProcessPoolExecutor(
+                max_workers=self.parallel_workers,
+                mp_context=mp.get_context('spawn'),
+                initializer=_init_segment_worker,
+                initargs=(self.model.z_dim, state_dict, threads, self.fast_path))
+        return self.segment_pool
+
+    def decode_segments(self, z):
+        """
+        Decode z: [1,C,T,H,W] in temporal segments on the parallel workers, yielding the
+        [1,3,t,H*8,W*8] float video of every segment in order. Matches the sequential decode
+        up to what the causal caches remember from beyond the halo.
+        """
+        tile, chunk = self.decode_plan(*z.shape[3:])
+        if self.parallel == 'distributed':
+            group = self.parallel_group
+            rank, world = dist.get_rank(group), dist.get_world_size(group)
+            segments = temporal_segments(z.shape[2], world, self.parallel_halo)
+            local = None
+            if rank < len(segments):
+                with amp.autocast("cuda", dtype=self.dtype):
+                    local = decode_segment(self.model, z, self.scale, *segments[rank], tile,
+                                           self.tile_overlap, chunk).float().cpu()
+            videos = [None] * world
+            dist.all_gather_object(videos, local, group=group)
+            for video in videos[:len(segments)]:
+                yield video.to(z.device)
+            return
+
+        segments = temporal_segments(z.shape[2], self.parallel_workers, self.parallel_halo)
+        pool = self.segment_executor()
+        scale = [u.cpu() if isinstance(u, torch.Tensor) else u for u in self.scale]
+        futures = [
+            pool.submit(_decode_segment_worker, z.cpu(), scale, *segment, tile,
+                        self.tile_overlap, chunk, self.dtype) for segment in segments
+        ]
+        for future in futures:
+            yield future.result()
+
+    def decode_plan(self, height, width):
+        """
+        (tile, chunk) for decoding a height x width latent, tile None when not tiling.
+        """
+        tile = self.tile_for(height, width)
+        if tile:
+            height, width = min(tile, height), min(tile, width)
+        return tile, self.chunk_for(height, width)
+
     @torch.no_grad()
     def encode(self, videos, device):
         """
         videos: A list of videos each with shape [C, T, H, W].
         """
-
+        ratio = self.model.spatial_ratio
+        latents = []
         with amp.autocast("cuda", dtype=self.dtype):
-            return [
-                self.model.encode(u.unsqueeze(0).to(device,self.dtype), self.scale).float().squeeze(0)
-                for u in videos
-            ]
+            for u in videos:
+                u = u.unsqueeze(0).to(device, self.dtype)
+                tile = self.tile_for(u.shape[3] // ratio, u.shape[4] // ratio)
+                if tile:
+                    mu = self.model.encode_tiled(u, self.scale, tile, self.tile_overlap)
+                else:
+                    mu = self.model.encode(u, self.scale)
+                latents.append(mu.float().squeeze(0))
+        return latents
 
     @torch.no_grad()
     def decode(self, zs):
+        videos = []
         with amp.autocast("cuda", dtype=self.dtype):
-            return [
-                self.model.decode(u.unsqueeze(0),
-                                  self.scale).float().clamp_(-1, 1).squeeze(0)
-                for u in zs
-            ]
+            for u in zs:
+                tile, chunk = self.decode_plan(*u.shape[2:])
+                if self.parallel_decode_for(u.shape[1]):
+                    video = torch.cat(list(self.decode_segments(u.unsqueeze(0))), dim=2)
+                elif tile:
+                    video = self.model.decode_tiled(
+                        u.unsqueeze(0), self.scale, tile, self.tile_overlap, chunk)
+                else:
+                    video = self.model.decode(u.unsqueeze(0), self.scale, chunk)
+                videos.append(video.float().clamp_(-1, 1).squeeze(0))
+        return videos
+
+    @torch.no_grad()
+    def decode_frames(self, z):
+        """
+        z: A latent video with shape [C, T, H, W].
+        Yields uint8 frame chunks with shape [t, H * 8, W * 8, 3] on the CPU as each
+        latent frame is decoded, so memory stays constant in the clip length. With a
+        parallel decode the chunks are whole segments, which the workers return as float
+        videos, so memory grows with the segment length instead.
+        """
+        tile, frames = self.decode_plan(*z.shape[2:])
+        if self.parallel_decode_for(z.shape[1]):
+            # Segments arrive in order as the workers finish them.
+            chunks = self.decode_segments(z.unsqueeze(0))
+        elif tile:
+            chunks = self.model.decode_tiled_iter(
+                z.unsqueeze(0), self.scale, tile, self.tile_overlap, frames)
+        else:
+            chunks = self.model.decode_iter(z.unsqueeze(0), self.scale, frames)
+        while True:
+            # Autocast only around the decode itself, not while the consumer holds the generator.
+            with amp.autocast("cuda", dtype=self.dtype):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                chunk = chunk[0].float().clamp_(-1, 1).mul_(0.5).add_(0.5).mul_(255).to(torch.uint8)
+            yield rearrange(chunk, "c t h w -> t h w c").cpu()
@@ -7,6 +7,7 @@ audio files using the provided models.
 '''
 import os
 import subprocess
+from contextlib import nullcontext
 
 import librosa
 import numpy as np
@@ -15,6 +16,8 @@ from audio_separator.separator import Separator
 from transformers import WhisperModel, AutoFeatureExtractor
 import torch.nn.functional as F
 
+from common.cache import file_identity, hash_key
+
 
 def linear_interpolation_fps(features, input_fps, output_fps, output_len=None):
     features = features.transpose(1, 2)  # [1, C, T]
@@ -47,6 +50,7 @@ class AudioProcessor:
     :param audio_separator_model_name: Name of the audio separator model
     :param cache_dir: Directory to cache the intermediate results
     :param device: Device to run the processing on
+    :param feature_cache: Optional TensorCache for audio embeddings, keyed by decoded audio content
     """
     def __init__(
         self,
@@ -58,10 +62,14 @@ class AudioProcessor:
         audio_separator_model_name:str=None,
         cache_dir:str='',
         device="cuda:0",
+        feature_cache=None,
     ) -> None:
         self.sample_rate = sample_rate
         self.fps = fps
         self.device = device
+        self.feature_cache = feature_cache
+        if feature_cache is not None:
+            self.feature_cache_id = hash_key(file_identity(wav2vec_model_path), wav2vec_feature_type)
 
         self.whisper = WhisperModel.from_pretrained(wav2vec_model_path).to(device).eval()
         self.whisper.requires_grad_(False)
@@ -84,10 +92,17 @@ class AudioProcessor:
             print("Use audio directly without vocals seperator.")        
 
 
-    def get_audio_feature(self, audio_path):
+    def load_audio(self, audio_path):
         audio_input, sampling_rate = librosa.load(audio_path, sr=16000)
         assert sampling_rate == 16000
+        return audio_input
 
+
+    def get_audio_feature(self, audio_path):
+        return self.extract_features(self.load_audio(audio_path))
+
+
+    def extract_features(self, audio_input, sampling_rate=16000):
         audio_features = []
         window = 750*640
         for i in range(0, len(audio_input), window):
@@ -100,8 +115,28 @@ class AudioProcessor:
         return audio_features, len(audio_input) // 640
 
 
-    def preprocess(self, audio_path: str):
-        audio_input, audio_len = self.get_audio_feature(audio_path)
+    def preprocess(self, audio_path: str, model_context=None):
+        """
+        model_context: optional callable returning a context manager around the Whisper forward,
+        e.g. to move the encoder to the device only when the feature cache misses.
+        """
+        audio_input = self.load_audio(audio_path)
+        if self.feature_cache is not None:
+            cache_key = hash_key(self.feature_cache_id, audio_input.tobytes())
+            cached = self.feature_cache.get(cache_key)
+            if cached is not None:
+                audio_emb = cached["audio_emb"]
+                return audio_emb, audio_emb.shape[0]
+
+        with (model_context() if model_context is not None else nullcontext()):
+            audio_emb = self.encode_features(*self.extract_features(audio_input))
+
+        if self.feature_cache is not None:
+            self.feature_cache.put(cache_key, {"audio_emb": audio_emb})
+        return audio_emb, audio_emb.shape[0]
+
+
+    def encode_features(self, audio_input, audio_len):
         audio_feature = audio_input.to(self.whisper.device).float()
         window = 3000
         audio_prompts = []
@@ -113,9 +148,7 @@ class AudioProcessor:
         audio_prompts = torch.cat(audio_prompts, dim=1)
         audio_prompts = audio_prompts[:,:audio_len*2]
 
-        audio_emb = self.audio_emb_enc(audio_prompts, wav_enc_type="whisper")
-
-        return audio_emb, audio_emb.shape[0]
+        return self.audio_emb_enc(audio_prompts, wav_enc_type="whisper")
     
     def audio_emb_enc(self, audio_emb, wav_enc_type="whisper"):
         if wav_enc_type == "wav2vec":
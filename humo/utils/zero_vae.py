@@ -0,0 +1,75 @@
+'''
+This module contains the ZeroVAE class, which provides the zero-VAE conditioning latents
+(the VAE encoding of a blank video) for arbitrary clip lengths and resolutions.
+'''
+import math
+import os
+from contextlib import nullcontext
+
+import torch
+
+from common.cache import TensorCache, file_identity, hash_key
+
+
+class ZeroVAE:
+    """
+    ZeroVAE derives the zero-VAE latent for any (frames, height, width) by encoding a blank
+    video with WanVAE. Results are memoized per resolution and configured VAE settings (see
+    WanVAE.cache_options) in a size-bounded TensorCache, safetensors on disk. Because the VAE is causal,
+    the latent of a longer clip starts with the latent of every shorter one; a request longer
+    than the cached entry re-encodes a longer blank video, growing by growth_factor.
+
+    :param vae: WanVAE used for encoding
+    :param vae_checkpoint: Path of the VAE checkpoint, part of the cache key
+    :param cache: Optional TensorCache, defaults to an in-memory cache
+    :param seed_paths: Precomputed zero-VAE .pt files used as-is for matching resolutions.
+        They were encoded with the default VAE settings and are ignored otherwise.
+    :param growth_factor: Minimum temporal growth when an entry has to be extended
+    """
+    def __init__(
+        self,
+        vae,
+        vae_checkpoint,
+        cache: TensorCache = None,
+        seed_paths=(),
+        growth_factor: float = 1.5,
+    ) -> None:
+        self.vae = vae
+        self.cache = cache if cache is not None else TensorCache()
+        self.cache_id = hash_key(file_identity(vae_checkpoint), "zero_vae")
+        self.growth_factor = growth_factor
+
+        # Precomputed latents are [C, T, H/8, W/8], keyed by their latent resolution.
+        self.seeds = {}
+        for path in seed_paths:
+            if path and os.path.exists(path):
+                latent = torch.load(path, map_location="cpu", mmap=True)
+                self.seeds[tuple(latent.shape[2:])] = latent
+
+    def get(self, latent_frames, height, width, device, model_context=None):
+        """
+        Return a zero-VAE latent with at least latent_frames frames for a height x width clip.
+
+        :param model_context: optional callable returning a context manager around the VAE
+            encode, e.g. to move the VAE to the device only when the cache misses
+        """
+        latent_size = (height // 8, width // 8)
+        key = hash_key(self.cache_id, height, width, *self.vae.cache_options())
+
+        cached = self.cache.get(key)
+        latent = cached["latent"] if cached is not None else None
+        if latent is None and self.vae.default_options():
+            latent = self.seeds.get(latent_size, None)
+        if latent is not None and latent.shape[1] >= latent_frames:
+            return latent
+
+        if latent is not None:
+            latent_frames = max(latent_frames, math.ceil(latent.shape[1] * self.growth_factor))
+        with (model_context() if model_context is not None else nullcontext()):
+            latent = self.encode(latent_frames, height, width, device)
+        return self.cache.put(key, {"latent": latent})["latent"]
+
+    def encode(self, latent_frames, height, width, device):
+        frames = 4 * (latent_frames - 1) + 1
+        blank = torch.zeros(3, frames, height, width)
+        return self.vae.encode([blank], device)[0]
@@ -21,8 +21,10 @@ if path_to_insert not in sys.path:
 
 from common.config import load_config, create_object
 
-# Load config.
-config = load_config(argv[1], argv[2:])
+if __name__ == "__main__":
+    # Guarded so that spawned worker processes (e.g. the parallel VAE decode) do not rerun it.
+    # Load config.
+    config = load_config(argv[1], argv[2:])
 
-runner = create_object(config)
-runner.entrypoint()
+    runner = create_object(config)
+    runner.entrypoint()